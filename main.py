@@ -1,10 +1,14 @@
+import queue
 import threading
-import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from customtkinter import *
 from tkinterdnd2 import TkinterDnD, DND_ALL
 from tkinter.filedialog import askopenfilename, asksaveasfilename
 from tkinter.messagebox import showerror
-from stegano import lsb
+from stega import tiled
+from stega.images import load_image, save_image
+from stega.png import ancillary_chunks
 
 set_appearance_mode("dark")
 set_default_color_theme("GuiTheme.json")
@@ -23,16 +27,89 @@ img = None
 frame = None
 selected_method = None
 
-def encode_img(text):
-    global progressbar, img
-    img = lsb.hide(FILE, text)
-    progressbar.stop()
-
-    for x in range(0, 101):
-        progressbar.set(2 * x / 100)
-        root.update()
+# Embedding and extraction run on a worker thread. The worker never touches
+# Tk: it posts ('progress' | 'done' | 'error' | 'cancelled', value, callback)
+# messages to results, which the Tk thread polls with after().
+executor = ThreadPoolExecutor(max_workers=1)
+results = queue.Queue()
+cancel_event = threading.Event()
+POLL_MS = 50
+# Number of strips the image is processed in, i.e. progress steps. The
+# strips only give progress and cancellation here: the whole image is
+# decoded in memory (and shown), memory is not bounded by the strip size.
+PROGRESS_STEPS = 50
+
+class Cancelled(Exception):
+    pass
+
+def run_in_background(job, on_done):
+    global cancel_event
+    cancel_event = event = threading.Event()
+
+    def progress(done, total):
+        if event.is_set():
+            raise Cancelled()
+        results.put(('progress', done / total, None))
+
+    def work():
+        try:
+            results.put(('done', job(progress), on_done))
+        except Cancelled:
+            results.put(('cancelled', None, None))
+        except Exception as e:
+            results.put(('error', e, None))
+
+    executor.submit(work)
+    root.after(POLL_MS, poll_results)
+
+def poll_results():
+    try:
+        while True:
+            kind, value, callback = results.get_nowait()
+            if kind == 'progress':
+                progressbar.set(value)
+            elif kind == 'done':
+                callback(value)
+                return
+            elif kind == 'error':
+                showerror("Error", value)
+                home()
+                return
+            else:
+                home()
+                return
+    except queue.Empty:
+        pass
+    root.after(POLL_MS, poll_results)
+
+def cancel():
+    cancel_event.set()
+
+def tile_bytes(image):
+    return max(image.nbytes // PROGRESS_STEPS, 1)
+
+def progress_ui(message):
+    global progressbar
 
-    time.sleep(0.5)
+    for widget in frame.winfo_children():
+        widget.destroy()
+    description = CTkLabel(frame, text=message, font=("HaxrCorp4089", 20), anchor="w", fg_color="#ffffff")
+    description.pack(fill="x", pady=20, padx=20)
+    progressbar = CTkProgressBar(frame, height=20, corner_radius=3)
+    progressbar.pack(expand=True, fill="x", padx=20)
+    progressbar.set(0)
+    cancel_btn = CTkButton(frame, text="Annuler", font=("HaxrCorp4089", 20), command=cancel, fg_color="#ff0000")
+    cancel_btn.pack(pady=20)
+
+def encode_img(text, progress):
+    cover = load_image(FILE)
+    stego = np.empty_like(cover)
+    tiled.embed(cover, text, stego, selected_method, tile_bytes(cover), progress=progress)
+    return stego
+
+def encoded(image):
+    global img
+    img = image
     for widget in frame.winfo_children():
         widget.destroy()
 
@@ -45,23 +122,14 @@ def encode_img(text):
 def save():
     file = asksaveasfilename()
     if file != "":
-        if file.endswith(".png"):
-            img.save(file)
-        else:
-            img.save(file + ".png")
+        if not file.endswith(".png"):
+            file += ".png"
+        # Keeps the colour profile, resolution and text chunks of the cover
+        save_image(file, img, chunks=ancillary_chunks(FILE))
 
 def encode(text):
-    global progressbar
-
-    for widget in frame.winfo_children():
-        widget.destroy()
-    description = CTkLabel(frame, text="Travail en cours.....", font=("HaxrCorp4089", 20), anchor="w", fg_color="#ffffff")
-    description.pack(fill="x", pady=20, padx=20)
-    progressbar = CTkProgressBar(frame, height=20, corner_radius=3)
-    progressbar.pack(expand=True, fill="x", padx=20)
-    progressbar.start()
-    t1 = threading.Thread(target=encode_img, args=(text,))
-    t1.start()
+    progress_ui("Travail en cours.....")
+    run_in_background(lambda progress: encode_img(text, progress), encoded)
 
 def choose_image_and_encode():
     global FILE
@@ -69,11 +137,11 @@ def choose_image_and_encode():
     if file != "":
         if file.endswith(".png") or file.endswith(".PNG"):
             FILE = file
-            method_selection_ui()
+            method_selection_ui(encode_ui)
         else:
             show_error()
 
-def method_selection_ui():
+def method_selection_ui(next_step):
     for widget in frame.winfo_children():
         widget.destroy()
 
@@ -87,13 +155,13 @@ def method_selection_ui():
     # Create buttons for each method
     for method in methods:
         method_btn = CTkButton(frame, font=("HaxrCorp4089", 20), text=f" {method} ", anchor="w",
-                               command=lambda m=method: process_encoding_method(m))
+                               command=lambda m=method: process_encoding_method(m, next_step))
         method_btn.pack(expand=True, fill="both", padx=20, pady=(0, 20))
 
-def process_encoding_method(method):
+def process_encoding_method(method, next_step):
     global selected_method
     selected_method = method
-    encode_ui()
+    next_step()
 
 def encode_ui():
     for widget in frame.winfo_children():
@@ -102,23 +170,25 @@ def encode_ui():
     data = CTkTextbox(frame, height=150, font=("HaxrCorp4089", 20))
     data.pack(expand=True, fill="both", padx=20, pady=20)
 
-    encode_btn = CTkButton(frame, font=("HaxrCorp4089", 20), text="Dissimuler le secret", anchor="w", command=lambda: encode(data.get(0.0, "end")), fg_color="#00ff00")
+    encode_btn = CTkButton(frame, font=("HaxrCorp4089", 20), text="Dissimuler le secret", anchor="w", command=lambda: encode(data.get("1.0", "end-1c")), fg_color="#00ff00")
     encode_btn.pack(expand=True, fill="both", padx=20, pady=(0, 20))
 
-def decode_ui():
+def decode_img(progress):
+    stego = load_image(FILE)
+    return tiled.extract(stego, selected_method, tile_bytes(stego), progress=progress).to_text()
+
+def decoded(data):
     for widget in frame.winfo_children():
         widget.destroy()
-    try:
-        data = lsb.reveal(FILE)
-        text = CTkLabel(frame, text=data, font=("HaxrCorp4089", 20), wraplength=500, fg_color="#ffffff", bg_color="transparent")
-        text.place(anchor="center", relx=0.5, rely=0.5)
+    text = CTkLabel(frame, text=data, font=("HaxrCorp4089", 20), wraplength=500, fg_color="#ffffff", bg_color="transparent")
+    text.place(anchor="center", relx=0.5, rely=0.5)
 
-        go_back = CTkButton(frame, text="Revenir en arrière", font=("HaxrCorp4089", 20), command=home, fg_color="#ff0000")
-        go_back.place(anchor="nw", x=20, y=20)
-    except Exception as e:
-        showerror("Error", e)
-        go_back = CTkButton(frame, text="Revenir en arrière", font=("HaxrCorp4089", 20), command=home, fg_color="#ff0000")
-        go_back.place(anchor="nw", x=20, y=20)
+    go_back = CTkButton(frame, text="Revenir en arrière", font=("HaxrCorp4089", 20), command=home, fg_color="#ff0000")
+    go_back.place(anchor="nw", x=20, y=20)
+
+def decode_ui():
+    progress_ui("Extraction en cours.....")
+    run_in_background(decode_img, decoded)
 
 def encode_or_decode_ui():
     for widget in frame.winfo_children():
@@ -137,7 +207,7 @@ def choose_file_decod():
         if file.endswith(".png") or file.endswith(".PNG"):
             global FILE
             FILE = file
-            decode_ui()
+            method_selection_ui(decode_ui)
         else:
             show_error()
 
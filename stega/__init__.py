@@ -0,0 +1,21 @@
+import importlib
+
+# Method name (as shown in the GUI) -> engine module. Engines are imported on
+# first use so that importing stega only costs NumPy.
+METHODS = {
+    'LSB': 'lsb',
+    'PVD': 'pvd',
+    'DCT': 'dct',
+    'DHWT': 'dhwt',
+    'JPEG': 'jpeg',
+    'ROBUST': 'robust',
+}
+
+def get_module(method):
+    try:
+        name = METHODS[method.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown method {method!r}, expected one of {', '.join(METHODS)}") from None
+    return importlib.import_module(f'{__name__}.{name}')
+
+from .base import Embedder, Extractor
@@ -0,0 +1,192 @@
+import argparse
+import ast
+import os
+import sys
+from . import METHODS
+
+def parse_option(text):
+    # key=value, value read as a Python literal when possible (n_bits=2, step=16.0)
+    key, _, value = text.partition('=')
+    try:
+        return key, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return key, value
+
+def add_batch_arguments(parser):
+    parser.add_argument('--method', required=True, type=str.upper, choices=list(METHODS))
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--covers', help="directory of input images")
+    source.add_argument('--manifest', help="CSV file with an input column and optional secret/output columns")
+    parser.add_argument('--out', required=True, help="output directory")
+    parser.add_argument('--journal', help="JSON lines result file used to resume (default: OUT/journal.jsonl)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--chunksize', type=int, default=8, help="files per task sent to a worker")
+    parser.add_argument('--max-in-flight', type=int, help="tasks submitted at once (default: 2 per worker)")
+    parser.add_argument('-o', '--option', action='append', default=[], type=parse_option, help="method option as key=value")
+
+def parse_shape(text):
+    return tuple(int(size) for size in text.split(','))
+
+def add_tiled_arguments(parser):
+    parser.add_argument('--method', required=True, type=str.upper, choices=[m for m in METHODS if m not in ('JPEG', 'ROBUST')])
+    parser.add_argument('--shape', type=parse_shape, help="HEIGHT,WIDTH[,CHANNELS] of a raw uint8 pixel file")
+    parser.add_argument('--tile-mb', type=float, default=64, help="size of the strips read at once")
+    parser.add_argument('-o', '--option', action='append', default=[], type=parse_option, help="method option as key=value")
+
+def run_tiled(args):
+    from . import tiled
+    tile_bytes = int(args.tile_mb * 1024 * 1024)
+    if args.command == 'embed-tiled':
+        if args.text is not None:
+            secret = args.text
+        else:
+            with open(args.secret, 'rb') as f:
+                secret = f.read()
+        bits = tiled.embed_file(args.cover, secret, args.out, args.method, tile_bytes, args.shape, **dict(args.option))
+        print(f"{bits} bits embedded")
+    else:
+        bitstream = tiled.extract_file(args.stego, args.method, tile_bytes, args.shape, **dict(args.option))
+        with open(args.out, 'wb') as f:
+            f.write(bitstream.to_bytes())
+    return 0
+
+def add_video_arguments(parser):
+    parser.add_argument('--method', required=True, type=str.upper, choices=[m for m in METHODS if m != 'JPEG'])
+    parser.add_argument('--video', required=True, help="lossless video (FFV1 or PNG codec)")
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--window', type=int, help="frames in flight (default: 2 per worker)")
+    parser.add_argument('-o', '--option', action='append', default=[], type=parse_option, help="method option as key=value")
+
+def run_video(args):
+    from . import video
+    if args.command == 'embed-video':
+        if args.text is not None:
+            secret = args.text
+        else:
+            with open(args.secret, 'rb') as f:
+                secret = f.read()
+        bits = video.embed(args.video, secret, args.out, args.method, args.codec, args.workers, args.window,
+                           args.frame_bits, **dict(args.option))
+        print(f"{bits} bits embedded")
+    else:
+        bitstream = video.extract(args.video, args.method, args.workers, args.window, **dict(args.option))
+        with open(args.out, 'wb') as f:
+            f.write(bitstream.to_bytes())
+    return 0
+
+def run_screen(args):
+    from .batch import run_batch, screen_tasks
+    options = {'threshold': args.threshold}
+    if args.tests:
+        options['tests'] = tuple(args.tests.split(','))
+    suspicious = []
+
+    def report(record):
+        if record['status'] != 'ok':
+            print(f"{record['input']}: error: {record['error']}", file=sys.stderr)
+        elif record['suspicious']:
+            suspicious.append(record['input'])
+            print(f"{record['input']}: suspicious, estimated rate {record['rate']:.3f}")
+
+    counts = run_batch('screen', None, screen_tasks(args.images), args.report, options=options, workers=args.workers,
+                       chunksize=args.chunksize, max_in_flight=args.max_in_flight, report=report)
+    print(f"{counts['ok']} screened, {len(suspicious)} suspicious, {counts['error']} failed, {counts['skipped']} already done")
+    return 1 if counts['error'] else 0
+
+def run_service(args):
+    from .service import serve
+    print(f"Serving on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        serve(args.host, args.port, workers=args.workers, batch_size=args.batch_size, batch_wait=args.batch_wait_ms / 1000,
+              max_body=int(args.max_body_mb * 1024 * 1024))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m stega')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    embed = commands.add_parser('embed', help="hide a secret in every cover")
+    add_batch_arguments(embed)
+    secret = embed.add_mutually_exclusive_group()
+    secret.add_argument('--secret', help="file to hide")
+    secret.add_argument('--text', help="text to hide")
+
+    extract = commands.add_parser('extract', help="recover the secret of every stego image")
+    add_batch_arguments(extract)
+
+    embed_tiled = commands.add_parser('embed-tiled', help="hide a secret in a large .npy or raw image, strip by strip")
+    add_tiled_arguments(embed_tiled)
+    embed_tiled.add_argument('--cover', required=True)
+    embed_tiled.add_argument('--out', required=True, help="output image, same format as the cover")
+    secret = embed_tiled.add_mutually_exclusive_group(required=True)
+    secret.add_argument('--secret', help="file to hide")
+    secret.add_argument('--text', help="text to hide")
+
+    extract_tiled = commands.add_parser('extract-tiled', help="recover the secret of a large .npy or raw image")
+    add_tiled_arguments(extract_tiled)
+    extract_tiled.add_argument('--stego', required=True)
+    extract_tiled.add_argument('--out', required=True, help="file the secret is written to")
+
+    embed_video = commands.add_parser('embed-video', help="hide a secret across the frames of a lossless video")
+    add_video_arguments(embed_video)
+    embed_video.add_argument('--codec', default='FFV1', type=str.upper, choices=['FFV1', 'PNG'], help="codec of the output (.mkv or .avi)")
+    embed_video.add_argument('--frame-bits', type=int, help="most payload bits per frame (default: what a frame holds)")
+    secret = embed_video.add_mutually_exclusive_group(required=True)
+    secret.add_argument('--secret', help="file to hide")
+    secret.add_argument('--text', help="text to hide")
+
+    extract_video = commands.add_parser('extract-video', help="recover the secret of a stego video")
+    add_video_arguments(extract_video)
+
+    screen = commands.add_parser('screen', help="estimate the payload rate of every image (LSB and PVD steganalysis)")
+    screen.add_argument('--images', required=True, help="directory of images to screen")
+    screen.add_argument('--report', required=True, help="JSON lines report, also used to resume")
+    screen.add_argument('--threshold', type=float, default=0.05, help="estimated rate above which an image is suspicious")
+    screen.add_argument('--tests', help="comma separated subset of chi_square,rs,spa,pvd")
+    screen.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    screen.add_argument('--chunksize', type=int, default=8, help="files per task sent to a worker")
+    screen.add_argument('--max-in-flight', type=int, help="tasks submitted at once (default: 2 per worker)")
+
+    serve = commands.add_parser('serve', help="HTTP service for embed, extract and capacity requests")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    serve.add_argument('--batch-size', type=int, default=16, help="most small requests sent to a worker together")
+    serve.add_argument('--batch-wait-ms', type=float, default=5, help="how long a small request waits for others")
+    serve.add_argument('--max-body-mb', type=float, default=64, help="largest accepted upload")
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        return run_service(args)
+    if args.command in ('embed-tiled', 'extract-tiled'):
+        return run_tiled(args)
+    if args.command in ('embed-video', 'extract-video'):
+        return run_video(args)
+    if args.command == 'screen':
+        return run_screen(args)
+
+    from .batch import directory_tasks, manifest_tasks, run_batch
+    secret, text = getattr(args, 'secret', None), getattr(args, 'text', None)
+    if args.command == 'embed' and args.covers and secret is None and text is None:
+        parser.error("--secret or --text is required with --covers")
+    os.makedirs(args.out, exist_ok=True)
+    if args.covers:
+        tasks = directory_tasks(args.command, args.method, args.covers, args.out, secret, text)
+    else:
+        tasks = manifest_tasks(args.command, args.method, args.manifest, args.out, secret, text)
+
+    def report(record):
+        status = record['status'] if record['status'] == 'ok' else f"error: {record['error']}"
+        print(f"{record['input']}: {status}", file=sys.stderr if record['status'] != 'ok' else sys.stdout)
+
+    counts = run_batch(args.command, args.method, tasks, args.journal or os.path.join(args.out, 'journal.jsonl'),
+                       options=dict(args.option), workers=args.workers, chunksize=args.chunksize,
+                       max_in_flight=args.max_in_flight, report=report)
+    print(f"{counts['ok']} done, {counts['error']} failed, {counts['skipped']} already done")
+    return 1 if counts['error'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+from . import get_module, planner
+
+class Embedder:
+    # Common interface over the engine modules. options are the keyword
+    # arguments of the method, e.g. Embedder('LSB', n_bits=2). Cover analyses
+    # go through a planner.AnalysisCache (the shared one by default), so
+    # embedding again into the same cover skips the analysis.
+
+    def __init__(self, method, cache=None, **options):
+        self.method = method.upper()
+        self.options = options
+        self.module = get_module(self.method)
+        planner.check_options(self.module, options)
+        self.cache = cache or planner.default_cache
+
+    def analyze(self, cover):
+        return self.cache.get(cover, self.method, **self.options)
+
+    def capacity(self, cover):
+        return self.analyze(cover)['capacity']
+
+    def fits(self, cover, secret_data):
+        return planner.fits(cover, secret_data, self.method, self.cache, **self.options)
+
+    def embed_bits(self, cover, bits):
+        return planner.call(self.module.embed_bits, cover, bits, **planner.engine_options(self.module, self.options, self.analyze(cover)))
+
+    def embed(self, cover, secret_data):
+        return planner.call(self.module.embed, cover, secret_data, **planner.engine_options(self.module, self.options, self.analyze(cover)))
+
+class Extractor:
+    def __init__(self, method, **options):
+        self.method = method.upper()
+        self.options = options
+        self.module = get_module(self.method)
+        planner.check_options(self.module, options)
+
+    def extract_bits(self, stego, n):
+        return planner.call(self.module.extract_bits, stego, n, **self.options)
+
+    def extract(self, stego):
+        return planner.call(self.module.extract, stego, **self.options)
@@ -0,0 +1,157 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from . import Embedder, Extractor, get_module, payload
+from .images import is_jpeg, list_images, load_image, save_image
+from .png import ancillary_chunks
+
+# Batch embedding/extraction (or steganalysis screening) over many files with a process pool.
+# Every finished file is appended to a JSON lines journal; running the same
+# batch again skips the tasks the journal already records as done. A task
+# is its (action, method, input, output): the same covers embedded with
+# another method or into another directory are not skipped.
+
+def load_cover(method, path):
+    if method == 'JPEG':
+        return get_module(method).read_jpeg(path)
+    return load_image(path)
+
+def save_stego(method, path, stego, cover_path):
+    if method == 'JPEG':
+        write_bytes(path, stego.to_bytes())
+    else:
+        # Colour profile, resolution and text chunks of a PNG cover are kept
+        save_image(path, stego, chunks=ancillary_chunks(cover_path))
+
+def write_bytes(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+@lru_cache(maxsize=8)
+def read_secret(path):
+    # Covers of a batch usually share one secret file: read it once per worker
+    with open(path, 'rb') as f:
+        return f.read()
+
+def run_task(action, method, options, task):
+    if action == 'screen':
+        from . import steganalysis
+        return steganalysis.analyze(load_image(task['input']), **options)
+    if action == 'embed':
+        secret = task['text'] if task.get('text') is not None else read_secret(task['secret'])
+        bitstream = payload.from_secret(secret, method)
+        # Through the analysis cache: covers repeated in a batch are analyzed once per worker
+        stego = Embedder(method, **options).embed(load_cover(method, task['input']), bitstream)
+        save_stego(method, task['output'], stego, task['input'])
+        return {'bits': len(bitstream)}
+    bitstream = Extractor(method, **options).extract(load_cover(method, task['input']))
+    write_bytes(task['output'], bitstream.to_bytes())
+    return {'bits': len(bitstream)}
+
+def run_chunk(action, method, options, tasks):
+    # Runs in a worker process: one record per task, failures included
+    records = []
+    for task in tasks:
+        start = time.perf_counter()
+        record = {'action': action, 'method': method, 'input': task['input'], 'output': task['output']}
+        try:
+            record.update(run_task(action, method, options, task))
+            record['status'] = 'ok'
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = f'{type(e).__name__}: {e}'
+        record['seconds'] = round(time.perf_counter() - start, 4)
+        records.append(record)
+    return records
+
+def output_name(action, method, path, out_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if action == 'extract':
+        extension = '.bin'
+    else:
+        extension = '.jpg' if method == 'JPEG' else '.png'
+    return os.path.join(out_dir, stem + extension)
+
+def screen_tasks(directory):
+    # Screening writes no files: the journal is the report
+    return [{'input': path, 'output': None} for path in list_images(directory)]
+
+def directory_tasks(action, method, directory, out_dir, secret=None, text=None):
+    tasks = []
+    for path in list_images(directory):
+        if method == 'JPEG' and not is_jpeg(path):
+            continue
+        tasks.append({'input': path, 'output': output_name(action, method, path, out_dir), 'secret': secret, 'text': text})
+    return tasks
+
+def manifest_tasks(action, method, manifest, out_dir, secret=None, text=None):
+    # CSV with an input column and optional secret/output columns
+    base = os.path.dirname(os.path.abspath(manifest))
+    tasks = []
+    with open(manifest, newline='') as f:
+        for row in csv.DictReader(f):
+            path = os.path.join(base, row['input'])
+            task = {'input': path, 'output': output_name(action, method, path, out_dir), 'secret': secret, 'text': text}
+            if row.get('output'):
+                task['output'] = os.path.join(base, row['output'])
+            if row.get('secret'):
+                task['secret'] = os.path.join(base, row['secret'])
+                task['text'] = None
+            tasks.append(task)
+    return tasks
+
+def journal_key(action, method, task):
+    return action, method, task['input'], task['output']
+
+def read_journal(path):
+    # Keys of the tasks done according to the journal. A truncated last line
+    # (crash while writing) is ignored, as are records of older journals
+    # without action and method: those tasks are run again.
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'ok':
+                done.add(journal_key(record.get('action'), record.get('method'), record))
+    return done
+
+def run_batch(action, method, tasks, journal_path, options=None, workers=None, chunksize=8, max_in_flight=None, report=None):
+    method = method.upper() if method else None
+    options = options or {}
+    done = read_journal(journal_path)
+    pending = [task for task in tasks if journal_key(action, method, task) not in done]
+    for task in pending:
+        if task['output']:
+            os.makedirs(os.path.dirname(os.path.abspath(task['output'])), exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    # Bounded number of submitted chunks: memory stays flat whatever the batch size
+    max_in_flight = max_in_flight or 2 * workers
+    chunks = [pending[i:i + chunksize] for i in range(0, len(pending), chunksize)]
+    counts = {'ok': 0, 'error': 0, 'skipped': len(tasks) - len(pending)}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(journal_path, 'a') as journal:
+        chunks.reverse()
+        in_flight = set()
+        while chunks or in_flight:
+            while chunks and len(in_flight) < max_in_flight:
+                in_flight.add(pool.submit(run_chunk, action, method, options, chunks.pop()))
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for record in future.result():
+                    journal.write(json.dumps(record) + '\n')
+                    counts[record['status']] += 1
+                    if report:
+                        report(record)
+                journal.flush()
+    return counts
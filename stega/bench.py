@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+from . import get_module, metrics, payload, planner
+
+# Throughput, memory and quality benchmark of every method:
+#   python -m stega.bench --output bench.json
+# Each result row is one (method, cover size, payload size) combination.
+#
+# With --robustness, recovery of ROBUST payloads after resizing and JPEG
+# recompression instead (needs pillow):
+#   python -m stega.bench --robustness --output robust.json
+# Each row is one (JPEG quality, scale factor) combination: share of the
+# secrets recovered and bit error rate of the code bits (copies combined)
+# before Reed-Solomon correction.
+#
+# With --steganalysis, what the screening tests estimate on covers (default
+# lena.png and baboon.png, --covers for others) before and after LSB (5 % of
+# capacity) and PVD (10 %) embedding, and the speed of each test on one
+# large cover:
+#   python -m stega.bench --steganalysis --output screen.json
+
+DEFAULT_SIZES = '256x256,512x512,1024x1024,1920x1080,3840x2160,7680x4320'
+DEFAULT_METHODS = 'LSB,PVD,DCT,DHWT'
+DEFAULT_PAYLOADS = '0.1,0.5,0.9'
+DEFAULT_QUALITIES = '95,85,75,60,50,40,30'
+DEFAULT_SCALES = '0.5,0.75,1,1.5,2'
+# Half of it is still as large as the default working plane
+DEFAULT_ROBUST_SIZE = '1024x1024'
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_IMAGE = os.path.join(REPOSITORY, 'lena.png')
+DEFAULT_SCREEN_COVERS = ','.join(os.path.join(REPOSITORY, name) for name in ('lena.png', 'baboon.png'))
+DEFAULT_SCREEN_SIZE = '4096x4096'
+SCREEN_PAYLOADS = (('LSB', 0.05), ('PVD', 0.1))
+
+def cover_image(width, height, seed=0):
+    # lena.png resized to the requested size plus light noise, so covers have
+    # natural image statistics; a smooth random field if lena.png is missing
+    rng = np.random.default_rng(seed)
+    if os.path.exists(SOURCE_IMAGE):
+        from PIL import Image
+        with Image.open(SOURCE_IMAGE) as image:
+            base = np.array(image.convert('L').resize((width, height), Image.BICUBIC), dtype=np.int16)
+    else:
+        coarse = rng.integers(0, 256, (height // 16 + 2, width // 16 + 2)).astype(np.int16)
+        base = np.repeat(np.repeat(coarse, 16, axis=0), 16, axis=1)[:height, :width]
+    return np.clip(base + rng.integers(-2, 3, base.shape), 0, 255).astype(np.uint8)
+
+def best_time(function, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_case(method, cover, fraction, repeat=3, seed=0, measure_memory=True):
+    module = get_module(method)
+    available = module.capacity(cover)
+    n = int(available * fraction)
+    bits = np.random.default_rng(seed).integers(0, 2, n, dtype=np.uint8)
+    megapixels = cover.shape[0] * cover.shape[1] / 1e6
+
+    embed_seconds, stego = best_time(lambda: module.embed_bits(cover, bits), repeat)
+    extract_seconds, extracted = best_time(lambda: module.extract_bits(stego, n), repeat)
+    row = {
+        'method': method,
+        'width': cover.shape[1],
+        'height': cover.shape[0],
+        'payload_bits': n,
+        'capacity_bits': available,
+        'capacity_used': n / available if available else 0.0,
+        'embed_seconds': embed_seconds,
+        'extract_seconds': extract_seconds,
+        'embed_mpix_per_second': megapixels / embed_seconds if embed_seconds else None,
+        'extract_mpix_per_second': megapixels / extract_seconds if extract_seconds else None,
+        'bit_error_rate': metrics.bit_error_rate(bits, extracted),
+    }
+    # mse, psnr, ssim and histogram difference in one pass over the images
+    row.update(metrics.quality(cover, stego))
+    if measure_memory:
+        row['embed_peak_bytes'] = peak_memory(lambda: module.embed_bits(cover, bits))
+        row['extract_peak_bytes'] = peak_memory(lambda: module.extract_bits(stego, n))
+    return row
+
+def attack(stego, quality, scale):
+    # What a distribution channel does to an image: bicubic resize, then JPEG at quality
+    import io
+    from PIL import Image
+    image = Image.fromarray(stego)
+    if scale != 1:
+        image = image.resize((max(round(image.width * scale), 1), max(round(image.height * scale), 1)), Image.BICUBIC)
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=quality)
+    out.seek(0)
+    with Image.open(out) as attacked:
+        return np.array(attacked)
+
+def run_robustness_case(cover, quality, scale, payload_bytes, trials=5, seed=0, **options):
+    robust = get_module('ROBUST')
+    code_options = {name: options[name] for name in ('codeword', 'parity') if name in options}
+    plane_options = {name: value for name, value in options.items() if name not in code_options}
+    rng = np.random.default_rng(seed)
+    recovered = 0
+    errors = []
+    quality_rows = []
+    for _ in range(trials):
+        secret = rng.integers(0, 256, payload_bytes, dtype=np.uint8).tobytes()
+        stego = robust.embed(cover, secret, **options)
+        attacked = attack(stego, quality, scale)
+        code = robust.encode(payload.from_secret(secret, 'ROBUST').bits, **code_options)
+        soft = robust.soft_values(attacked, **plane_options)
+        errors.append(metrics.bit_error_rate(code, (soft < 0).astype(np.uint8)))
+        try:
+            recovered += robust.extract(attacked, **options).to_bytes() == secret
+        except ValueError:
+            pass
+        quality_rows.append(metrics.quality(cover, stego, ('psnr', 'ssim')))
+    return {
+        'quality': quality,
+        'scale': scale,
+        'width': cover.shape[1],
+        'height': cover.shape[0],
+        'payload_bytes': payload_bytes,
+        'trials': trials,
+        'recovery_rate': recovered / trials,
+        'raw_bit_error_rate': float(np.mean(errors)),
+        'psnr': float(np.mean([row['psnr'] for row in quality_rows])),
+        'ssim': float(np.mean([row['ssim'] for row in quality_rows])),
+        'options': {name: value for name, value in options.items() if name != 'positions'},
+    }
+
+def run_robustness(args):
+    robust = get_module('ROBUST')
+    options = {'size': args.size, 'step': args.step, 'repeat': args.robust_repeat, 'parity': args.parity}
+    width, height = parse_size(args.sizes.split(',')[0] if args.sizes != DEFAULT_SIZES else DEFAULT_ROBUST_SIZE)
+    cover = cover_image(width, height)
+    # Room for the frame header: the secret fills what is left of the capacity
+    payload_bytes = args.payload_bytes or planner.call(robust.capacity, cover, **options) // 8 - 32
+    results = []
+    for quality in (int(q) for q in args.qualities.split(',')):
+        for scale in (float(s) for s in args.scales.split(',')):
+            row = run_robustness_case(cover, quality, scale, payload_bytes, args.trials, **options)
+            results.append(row)
+            print(f"JPEG {quality:3} scale {scale:4}: recovered {row['recovery_rate']:.0%}, "
+                  f"raw BER {row['raw_bit_error_rate']:.4f}, PSNR {row['psnr']:.2f} dB")
+    return results
+
+def run_steganalysis(args):
+    from . import steganalysis
+    from .images import load_image
+    rng = np.random.default_rng(0)
+    results = []
+    for path in args.covers.split(','):
+        cover = load_image(path)
+        # The tests leave alpha out, so the payload goes to the colour channels only
+        if cover.ndim == 3 and cover.shape[2] in (2, 4):
+            cover = np.ascontiguousarray(cover[..., :-1])
+        cases = [('clean', cover)]
+        for method, fraction in SCREEN_PAYLOADS:
+            module = get_module(method)
+            bits = rng.integers(0, 2, int(module.capacity(cover) * fraction), dtype=np.uint8)
+            cases.append((f'{method} {fraction:.0%}', module.embed_bits(cover, bits, key='bench')))
+        for name, image in cases:
+            row = {'cover': os.path.basename(path), 'payload': name}
+            row.update(steganalysis.analyze(image))
+            results.append(row)
+            print(f"{row['cover']} {name:7}: rate {row['rate']:.3f} (RS {row['rs_rate']:.3f}, SPA {row['spa_rate']:.3f}, "
+                  f"LSB {row['lsb_rate']:.3f}, PVD {row['pvd_rate']:.3f}), {'suspicious' if row['suspicious'] else 'clean'}")
+
+    width, height = parse_size(args.sizes.split(',')[0] if args.sizes != DEFAULT_SIZES else DEFAULT_SCREEN_SIZE)
+    cover = cover_image(width, height)
+    megapixels = width * height / 1e6
+    tests = (('chi_square', steganalysis.chi_square), ('rs', steganalysis.rs_analysis), ('spa', steganalysis.sample_pairs),
+             ('pvd', steganalysis.pvd_analysis), ('analyze', steganalysis.analyze))
+    for name, test in tests:
+        seconds, _ = best_time(lambda: test(cover), args.repeat)
+        results.append({'test': name, 'width': width, 'height': height, 'seconds': seconds,
+                        'mpix_per_second': megapixels / seconds})
+        print(f"{name:10} {width}x{height}: {megapixels / seconds:.0f} MP/s")
+    return results
+
+def environment():
+    info = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+def parse_size(text):
+    width, _, height = text.partition('x')
+    return int(width), int(height or width)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m stega.bench')
+    parser.add_argument('--methods', default=DEFAULT_METHODS, help="comma separated methods")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma separated WIDTHxHEIGHT cover sizes")
+    parser.add_argument('--payloads', default=DEFAULT_PAYLOADS, help="comma separated payload sizes as fractions of capacity")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, the best one is kept")
+    parser.add_argument('--no-memory', action='store_true', help="skip the (slower) peak memory runs")
+    parser.add_argument('--output', default='bench.json')
+    robustness = parser.add_argument_group('robustness benchmark (ROBUST method)')
+    robustness.add_argument('--robustness', action='store_true', help="measure recovery after resizing and JPEG instead")
+    robustness.add_argument('--qualities', default=DEFAULT_QUALITIES, help="comma separated JPEG qualities")
+    robustness.add_argument('--scales', default=DEFAULT_SCALES, help="comma separated scale factors")
+    robustness.add_argument('--trials', type=int, default=5, help="secrets embedded per case")
+    robustness.add_argument('--payload-bytes', type=int, help="secret size (default: what the capacity allows)")
+    robustness.add_argument('--size', type=int, default=512, help="working plane side")
+    robustness.add_argument('--step', type=float, default=36, help="QIM step")
+    robustness.add_argument('--robust-repeat', type=int, default=8, help="copies of every code bit")
+    robustness.add_argument('--parity', type=int, default=16, help="Reed-Solomon parity bytes per 64 byte codeword")
+    screening = parser.add_argument_group('steganalysis benchmark')
+    screening.add_argument('--steganalysis', action='store_true', help="measure the screening tests instead")
+    screening.add_argument('--covers', default=DEFAULT_SCREEN_COVERS, help="comma separated cover images")
+    args = parser.parse_args(argv)
+
+    if args.robustness or args.steganalysis:
+        results = run_robustness(args) if args.robustness else run_steganalysis(args)
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+        return
+
+    results = []
+    for size in args.sizes.split(','):
+        width, height = parse_size(size)
+        cover = cover_image(width, height)
+        for method in args.methods.upper().split(','):
+            for fraction in (float(f) for f in args.payloads.split(',')):
+                row = run_case(method, cover, fraction, args.repeat, measure_memory=not args.no_memory)
+                results.append(row)
+                print(f"{method:5} {width}x{height} {fraction:.0%}: {row['embed_mpix_per_second']:.1f} MP/s embed, "
+                      f"{row['extract_mpix_per_second']:.1f} MP/s extract, PSNR {row['psnr']:.2f} dB, BER {row['bit_error_rate']:.4f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import struct
+import zlib
+from . import METHODS
+
+# Frame wrapped around every embedded secret:
+#
+#   magic 'SG', version, method, payload kind, compression      6 bytes
+#   data length, body length, CRC32 of the data (big endian)    12 bytes
+#   number of dimensions, then each dimension (image shape)     1 + 4 * ndim bytes
+#   body: the data, compressed or not
+#
+# The fixed part comes first so an extractor knows after 19 bytes whether
+# there is a frame at all (wrong method, options or key) and exactly how many
+# more bytes to read.
+
+MAGIC = b'SG'
+VERSION = 1
+HEADER = struct.Struct('>2sBBBBIIIB')
+KINDS = ('bytes', 'text', 'image')
+COMPRESSIONS = ('none', 'zlib', 'zstd')
+ZLIB_LEVEL = 9
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression needs the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+def compress(data, compression):
+    if compression == 'zlib':
+        return zlib.compress(data, ZLIB_LEVEL)
+    if compression == 'zstd':
+        return _zstd().ZstdCompressor(level=19).compress(data)
+    return data
+
+class ZlibBody:
+    # Incremental zlib decoding that never inflates past the declared data
+    # length: a crafted frame cannot expand to gigabytes
+
+    def __init__(self):
+        self.decoder = zlib.decompressobj()
+
+    def decompress(self, data, limit):
+        # At most limit + 1 bytes, one more than allowed tells the frame lies
+        return self.decoder.decompress(data, limit + 1)
+
+    def finish(self, limit):
+        if self.decoder.unconsumed_tail:
+            raise ValueError("Payload body larger than its declared length")
+        out = self.decoder.flush()
+        if not self.decoder.eof or self.decoder.unused_data:
+            raise ValueError("Corrupted payload body: truncated stream or trailing data")
+        return out
+
+class ZstdBody:
+    # The zstandard incremental decoder has no output bound: the (small,
+    # embedded) compressed body is collected and decoded at the end through
+    # a reader that stops one byte past the declared length
+
+    def __init__(self):
+        self.chunks = []
+
+    def decompress(self, data, limit):
+        self.chunks.append(data)
+        return b''
+
+    def finish(self, limit):
+        reader = _zstd().ZstdDecompressor().stream_reader(b''.join(self.chunks))
+        try:
+            out = reader.read(limit + 1)
+            if len(out) <= limit and reader.read(1):
+                raise ValueError("Payload body larger than its declared length")
+        except _zstd().ZstdError as e:
+            raise ValueError(f"Corrupted payload body: {e}") from None
+        return out
+
+def decompressor(compression):
+    # Object whose decompress(chunk, limit) returns the data decoded so far
+    # (at most limit + 1 bytes) and finish(limit) the rest, None when stored
+    if compression == 'zlib':
+        return ZlibBody()
+    if compression == 'zstd':
+        return ZstdBody()
+    return None
+
+def encode(data, kind='bytes', method=None, compression='auto', shape=None):
+    # 'auto' keeps the zlib body only when it is smaller than the data
+    data = bytes(data)
+    if compression == 'auto':
+        body = compress(data, 'zlib')
+        compression = 'zlib' if len(body) < len(data) else 'none'
+        if compression == 'none':
+            body = data
+    elif compression in COMPRESSIONS:
+        body = compress(data, compression)
+    else:
+        raise ValueError(f"Unknown compression {compression!r}, expected auto or one of {', '.join(COMPRESSIONS)}")
+    shape = tuple(shape or ())
+    method_code = list(METHODS).index(method.upper()) + 1 if method else 0
+    header = HEADER.pack(MAGIC, VERSION, method_code, KINDS.index(kind), COMPRESSIONS.index(compression),
+                         len(data), len(body), zlib.crc32(data), len(shape))
+    return header + struct.pack(f'>{len(shape)}I', *shape) + body
+
+class Frame:
+    def __init__(self, data, kind, method, compression, shape):
+        self.data = data
+        self.kind = kind
+        self.method = method
+        self.compression = compression
+        self.shape = shape
+
+class FrameDecoder:
+    # Incremental decoder: feed() the frame bytes in order, in chunks of any
+    # size, while needed is not 0. The body is decompressed and checked as it
+    # arrives; feed() returns the data decoded from each chunk.
+
+    def __init__(self):
+        self.buffer = b''
+        self.header = None
+        self.shape = None
+        self.remaining_body = 0
+        self.decoder = None
+        self.crc = 0
+        self.length = 0
+        self.chunks = []
+
+    @property
+    def needed(self):
+        # Bytes still missing, as far as is known from what was fed so far
+        if self.header is None:
+            return HEADER.size - len(self.buffer)
+        if self.shape is None:
+            return self.header[8] * 4 - len(self.buffer)
+        return self.remaining_body
+
+    def feed(self, data):
+        if self.header is None or self.shape is None:
+            self.buffer += data
+            data = self._parse_header()
+        if self.shape is None or not data:
+            return b''
+        data = data[:self.remaining_body]
+        self.remaining_body -= len(data)
+        limit = self.header[5] - self.length
+        try:
+            out = self.decoder.decompress(data, limit) if self.decoder else data
+            if len(out) <= limit and self.remaining_body == 0 and self.decoder:
+                out += self.decoder.finish(limit - len(out))
+        except zlib.error as e:
+            raise ValueError(f"Corrupted payload body: {e}") from None
+        if len(out) > limit:
+            raise ValueError("Payload body larger than its declared length")
+        self.crc = zlib.crc32(out, self.crc)
+        self.length += len(out)
+        self.chunks.append(out)
+        if self.remaining_body == 0:
+            self._check()
+        return out
+
+    def _parse_header(self):
+        # Returns the bytes fed past the header
+        if self.header is None:
+            if len(self.buffer) < HEADER.size:
+                return b''
+            header = HEADER.unpack(self.buffer[:HEADER.size])
+            magic, version, method_code, kind, compression = header[:5]
+            if magic != MAGIC:
+                raise ValueError("No embedded payload found (wrong method, options or key?)")
+            if version != VERSION:
+                raise ValueError(f"Unsupported payload version {version}")
+            if method_code > len(METHODS) or kind >= len(KINDS) or compression >= len(COMPRESSIONS):
+                raise ValueError("Corrupted payload header")
+            self.header = header
+            self.buffer = self.buffer[HEADER.size:]
+        size = self.header[8] * 4
+        if len(self.buffer) < size:
+            return b''
+        self.shape = struct.unpack(f'>{self.header[8]}I', self.buffer[:size])
+        self.remaining_body = self.header[6]
+        self.decoder = decompressor(COMPRESSIONS[self.header[4]])
+        rest, self.buffer = self.buffer[size:], b''
+        if self.remaining_body == 0:
+            self._check()
+        return rest
+
+    def _check(self):
+        if self.length != self.header[5] or self.crc != self.header[7]:
+            raise ValueError("Payload CRC mismatch: the stego image was modified or read with the wrong options")
+
+    def frame(self):
+        if self.header is None or self.shape is None or self.remaining_body:
+            raise ValueError("Incomplete payload frame")
+        method_code = self.header[2]
+        return Frame(b''.join(self.chunks), KINDS[self.header[3]], list(METHODS)[method_code - 1] if method_code else None,
+                     COMPRESSIONS[self.header[4]], self.shape or None)
+
+def decode(frame_bytes):
+    decoder = FrameDecoder()
+    decoder.feed(frame_bytes)
+    return decoder.frame()
+
+def read_frame(read_bytes):
+    # read_bytes(n) returns the next n bytes of the frame; reads no more than the frame holds
+    decoder = FrameDecoder()
+    while decoder.needed:
+        decoder.feed(read_bytes(decoder.needed))
+    return decoder.frame()
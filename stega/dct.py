@@ -0,0 +1,194 @@
+import numpy as np
+from . import payload, permute
+
+# Mid-frequency coefficients (row, column) of each block that carry one bit each
+MID_BAND = ((2, 3), (3, 2), (1, 4), (4, 1))
+# Quantization step of the QIM lattices
+DEFAULT_STEP = 24
+# Colour covers carry bits in every channel of every block. With 'ycbcr' the
+# coefficients are those of the JPEG (full range) YCbCr planes of the RGB
+# channels, with 'rgb' those of the channels as stored.
+COLOR_SPACES = ('ycbcr', 'rgb')
+RGB_TO_YCBCR = np.array([[0.299, 0.587, 0.114],
+                         [-0.168736, -0.331264, 0.5],
+                         [0.5, -0.418688, -0.081312]])
+YCBCR_TO_RGB = np.linalg.inv(RGB_TO_YCBCR)
+
+def dct_matrix(block_size):
+    # Orthonormal DCT-II basis: coefficients = D @ block @ D.T
+    n = np.arange(block_size)
+    basis = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * block_size))
+    basis[0] /= np.sqrt(2)
+    return basis * np.sqrt(2 / block_size)
+
+def split_blocks(image, block_size):
+    # (n_blocks, channels, block_size, block_size) copy of the full blocks in
+    # raster order, channels of a block side by side (1 for a grayscale image).
+    # Rows and columns left over at the bottom/right edge are not used.
+    image = np.asarray(image)
+    rows, cols = image.shape[0] // block_size, image.shape[1] // block_size
+    channels = image.shape[2] if image.ndim == 3 else 1
+    blocks = image[:rows * block_size, :cols * block_size].reshape(rows, block_size, cols, block_size, channels)
+    return blocks.transpose(0, 2, 4, 1, 3).reshape(-1, channels, block_size, block_size)
+
+def merge_blocks(image, blocks, block_size, indices=None):
+    # Write blocks back into a copy of image, at the given block indices or as the first len(blocks)
+    stego = np.array(image, copy=True)
+    rows, cols = stego.shape[0] // block_size, stego.shape[1] // block_size
+    grid = split_blocks(stego, block_size)
+    if indices is None:
+        grid[:len(blocks)] = blocks
+    else:
+        grid[indices] = blocks
+    region = stego[:rows * block_size, :cols * block_size]
+    region[...] = grid.reshape(rows, cols, -1, block_size, block_size).transpose(0, 3, 1, 4, 2).reshape(region.shape)
+    return stego
+
+def apply_dct_blocks(blocks):
+    basis = dct_matrix(blocks.shape[-1])
+    return basis @ blocks @ basis.T
+
+def apply_idct_blocks(dct_blocks):
+    basis = dct_matrix(dct_blocks.shape[-1])
+    return basis.T @ dct_blocks @ basis
+
+def channel_count(image):
+    image = np.asarray(image)
+    return image.shape[2] if image.ndim == 3 else 1
+
+def capacity(image, block_size=8, positions=MID_BAND):
+    image = np.asarray(image)
+    return (image.shape[0] // block_size) * (image.shape[1] // block_size) * channel_count(image) * len(positions)
+
+def row_alignment(block_size=8):
+    # Strips must hold whole rows of blocks
+    return block_size
+
+def check_positions(block_size, positions):
+    for row, col in positions:
+        if not (0 <= row < block_size and 0 <= col < block_size):
+            raise ValueError(f"Position {(row, col)} is outside the {block_size}x{block_size} block, "
+                             "give positions that fit block_size")
+
+def check_color_space(color_space):
+    if color_space not in COLOR_SPACES:
+        raise ValueError(f"Unknown color space {color_space!r}, expected one of {', '.join(COLOR_SPACES)}")
+
+def converts(blocks, color_space):
+    # YCbCr applies to the first three channels of colour blocks; alpha and grayscale stay as they are
+    return color_space == 'ycbcr' and blocks.shape[1] >= 3
+
+def to_working(blocks, color_space):
+    # Pixel blocks (float) to the channels bits are embedded in
+    if converts(blocks, color_space):
+        blocks = blocks.copy()
+        blocks[:, :3] = np.einsum('ij,njkl->nikl', RGB_TO_YCBCR, blocks[:, :3])
+        blocks[:, 1:3] += 128
+    return blocks
+
+def to_pixels(blocks, color_space):
+    if converts(blocks, color_space):
+        blocks = blocks.copy()
+        blocks[:, 1:3] -= 128
+        blocks[:, :3] = np.einsum('ij,njkl->nikl', YCBCR_TO_RGB, blocks[:, :3])
+    return blocks
+
+def quantize(coefficients, bits, step):
+    # Quantization index modulation: bit 0 on multiples of step, bit 1 on the lattice shifted by step / 2
+    offset = bits * (step / 2)
+    return np.round((coefficients - offset) / step) * step + offset
+
+def dequantize(coefficients, step):
+    return (np.round(coefficients / (step / 2)).astype(np.int64) & 1).astype(np.uint8)
+
+def embed_bits(image, bits, block_size=8, positions=MID_BAND, step=DEFAULT_STEP, key=None, color_space='ycbcr',
+               max_iterations=8):
+    check_positions(block_size, positions)
+    check_color_space(color_space)
+    available = capacity(image, block_size, positions)
+    if len(bits) > available:
+        raise ValueError(f"Secret needs {len(bits)} bits but the cover only holds {available}")
+
+    # One row of bits per channel of a block (the last block is zero padded)
+    per_block = channel_count(image) * len(positions)
+    n_blocks = -(-len(bits) // per_block)
+    block_bits = np.zeros(n_blocks * per_block, dtype=np.uint8)
+    block_bits[:len(bits)] = bits
+    block_bits = block_bits.reshape(n_blocks, -1, len(positions))
+    rows, cols = np.array(positions).T
+
+    # Blocks are the unit of keyed scattering: each keeps its bits together
+    order = permute.positions(available // per_block, key, n_blocks)
+    pixels = split_blocks(image, block_size)[order]
+    blocks = to_working(pixels.astype(np.float64), color_space)
+    margin = len(positions) * step / block_size
+    pending = np.arange(n_blocks)
+    for iteration in range(max_iterations):
+        if iteration >= 2:
+            # Blocks still failing are saturated: pull them away from 0/255 so rounding stops clipping
+            blocks[pending] = to_working(np.clip(pixels[pending], margin, 255 - margin), color_space)
+        coefficients = apply_dct_blocks(blocks[pending])
+        coefficients[..., rows, cols] = quantize(coefficients[..., rows, cols], block_bits[pending], step)
+        pixels[pending] = np.clip(np.round(to_pixels(apply_idct_blocks(coefficients), color_space)), 0, 255)
+        blocks[pending] = to_working(pixels[pending].astype(np.float64), color_space)
+
+        # Rounding back to uint8 can move a coefficient across a decision boundary: redo those blocks
+        check = apply_dct_blocks(blocks[pending])[..., rows, cols]
+        pending = pending[np.any(dequantize(check, step) != block_bits[pending], axis=(1, 2))]
+        if len(pending) == 0:
+            break
+    else:
+        raise ValueError(f"Could not embed into {len(pending)} blocks, try a larger step")
+
+    return merge_blocks(image, pixels, block_size, order)
+
+def extract_bits(stego_image, n, block_size=8, positions=MID_BAND, step=DEFAULT_STEP, key=None, color_space='ycbcr'):
+    check_positions(block_size, positions)
+    check_color_space(color_space)
+    available = capacity(stego_image, block_size, positions)
+    if n > available:
+        raise ValueError(f"Cannot read {n} bits from an image holding {available}")
+    per_block = channel_count(stego_image) * len(positions)
+    n_blocks = -(-n // per_block)
+    rows, cols = np.array(positions).T
+    order = permute.positions(available // per_block, key, n_blocks)
+    blocks = to_working(split_blocks(stego_image, block_size)[order].astype(np.float64), color_space)
+    return dequantize(apply_dct_blocks(blocks)[..., rows, cols], step).reshape(-1)[:n]
+
+def embed(image, secret_data, block_size=8, positions=MID_BAND, step=DEFAULT_STEP, key=None, color_space='ycbcr',
+          max_iterations=8):
+    return embed_bits(image, payload.from_secret(secret_data, 'DCT').bits, block_size, positions, step, key,
+                      color_space, max_iterations)
+
+def extract(stego_image, block_size=8, positions=MID_BAND, step=DEFAULT_STEP, key=None, color_space='ycbcr'):
+    return payload.read(lambda n: extract_bits(stego_image, n, block_size, positions, step, key, color_space))
+
+if __name__ == '__main__':
+    import cv2
+    import matplotlib.pyplot as plt
+    from .images import load_image
+
+    original_image = load_image('lena.png')
+
+    # Embed secret text
+    stego_text_image = embed(original_image, "TRY TO FIND ME")
+    print('Extracted:', extract(stego_text_image).to_text())
+
+    # Embed secret image (baboon, in colour, reduced to fit the 4 bits per block capacity)
+    secret_image = load_image('baboon.png')
+    secret_image = cv2.resize(secret_image, (secret_image.shape[1] // 32, secret_image.shape[0] // 32))
+    stego_image_image = embed(original_image, secret_image)
+
+    # Create a figure with two subplots
+    fig, axs = plt.subplots(1, 2, figsize=(10, 5))
+
+    # Plot stego text image
+    axs[0].imshow(stego_text_image, cmap='gray')
+    axs[0].set_title('Stego Image (secret is text) dct')
+
+    # Plot stego image
+    axs[1].imshow(stego_image_image, cmap='gray')
+    axs[1].set_title('Stego Image (secret is "baboon") dct')
+
+    # Display the figure
+    plt.show()
@@ -0,0 +1,158 @@
+import numpy as np
+from . import metrics, payload, permute
+
+def lift_forward(x, axis):
+    # Integer Haar (S transform) on pairs along axis: s = floor((a + b) / 2), d = a - b
+    index = [slice(None)] * x.ndim
+    index[axis] = slice(0, None, 2)
+    a = x[tuple(index)]
+    index[axis] = slice(1, None, 2)
+    b = x[tuple(index)]
+    d = a - b
+    return b + (d >> 1), d
+
+def lift_inverse(s, d, axis):
+    b = s - (d >> 1)
+    a = d + b
+    shape = list(a.shape)
+    shape[axis] *= 2
+    x = np.empty(shape, dtype=a.dtype)
+    index = [slice(None)] * len(shape)
+    index[axis] = slice(0, None, 2)
+    x[tuple(index)] = a
+    index[axis] = slice(1, None, 2)
+    x[tuple(index)] = b
+    return x
+
+def apply_2D_HWT(image, level=1):
+    # Multilevel reversible Haar transform over the whole image, in the layout
+    # of pywt.wavedec2: [LL_n, (LH_n, HL_n, HH_n), ..., (LH_1, HL_1, HH_1)].
+    # Both sides must be multiples of 2 ** level. A colour image is transformed
+    # per channel in the same pass: subbands keep the channel axis last, so
+    # flat subband indices are channel-interleaved.
+    ll = np.asarray(image, dtype=np.int32)
+    details = []
+    for _ in range(level):
+        low, high = lift_forward(ll, axis=1)
+        ll, lh = lift_forward(low, axis=0)
+        hl, hh = lift_forward(high, axis=0)
+        details.insert(0, (lh, hl, hh))
+    return [ll] + details
+
+def apply_2D_IHDWT(coeffs):
+    ll = coeffs[0]
+    for lh, hl, hh in coeffs[1:]:
+        low = lift_inverse(ll, lh, axis=0)
+        high = lift_inverse(hl, hh, axis=0)
+        ll = lift_inverse(low, high, axis=1)
+    return ll
+
+def transform_region(image, level):
+    # Largest top-left region whose sides are multiples of 2 ** level
+    size = 1 << level
+    return (image.shape[0] // size * size, image.shape[1] // size * size)
+
+def with_hh(coeffs, hh):
+    # Same coefficients with the deepest HH subband replaced
+    lh, hl, _ = coeffs[1]
+    return [coeffs[0], (lh, hl, hh)] + coeffs[2:]
+
+def block_range(pixels, level):
+    # Min and max of every 2 ** level square block, the area one HH coefficient of that level covers
+    # (per channel in a colour image)
+    size = 1 << level
+    blocks = pixels.reshape(pixels.shape[0] // size, size, pixels.shape[1] // size, size, *pixels.shape[2:])
+    return blocks.min(axis=(1, 3)), blocks.max(axis=(1, 3))
+
+def usable_coefficients(coeffs, level):
+    # A HH coefficient is used only if the block it covers stays in [0, 255]
+    # whatever its LSB is. The test ignores the LSB itself, so the extractor
+    # finds the same coefficients in the stego image.
+    hh = coeffs[1][2]
+    low_min, low_max = block_range(apply_2D_IHDWT(with_hh(coeffs, hh & ~1)), level)
+    high_min, high_max = block_range(apply_2D_IHDWT(with_hh(coeffs, hh | 1)), level)
+    return np.flatnonzero((np.minimum(low_min, high_min) >= 0) & (np.maximum(low_max, high_max) <= 255))
+
+def transform(image, level):
+    image = np.asarray(image)
+    height, width = transform_region(image, level)
+    return apply_2D_HWT(image[:height, :width], level)
+
+def analyze(image, level=1):
+    # The usable HH coefficients of a cover, whatever the payload
+    usable = usable_coefficients(transform(image, level), level)
+    return {'usable': usable, 'capacity': len(usable)}
+
+def capacity(image, level=1, analysis=None):
+    return (analyze(image, level) if analysis is None else analysis)['capacity']
+
+def row_alignment(level=1):
+    # Strips must hold whole 2 ** level blocks
+    return 1 << level
+
+def embed_bits(image, bits, level=1, analysis=None, key=None):
+    coeffs = transform(image, level)
+    usable = usable_coefficients(coeffs, level) if analysis is None else analysis['usable']
+    if len(bits) > len(usable):
+        raise ValueError(f"Secret needs {len(bits)} bits but the cover only holds {len(usable)}")
+
+    # Replace the LSB of the first usable HH coefficients
+    hh = coeffs[1][2].copy()
+    flat = hh.reshape(-1)
+    selected = permute.select(usable, key, len(bits))
+    flat[selected] = (flat[selected] & ~1) | bits
+
+    stego = np.array(image, dtype=np.uint8, copy=True)
+    height, width = transform_region(stego, level)
+    stego[:height, :width] = apply_2D_IHDWT(with_hh(coeffs, hh))
+    return stego
+
+def extract_bits(stego_image, n, level=1, analysis=None, key=None):
+    coeffs = transform(stego_image, level)
+    usable = usable_coefficients(coeffs, level) if analysis is None else analysis['usable']
+    if n > len(usable):
+        raise ValueError(f"Cannot read {n} bits from an image holding {len(usable)}")
+    return (coeffs[1][2].reshape(-1)[permute.select(usable, key, n)] & 1).astype(np.uint8)
+
+def calculate_PSNR(original, compressed):
+    return metrics.psnr(original, compressed)
+
+def embed(image, secret_data, level=1, analysis=None, key=None):
+    return embed_bits(image, payload.from_secret(secret_data, 'DHWT').bits, level, analysis, key)
+
+def extract(stego_image, level=1, analysis=None, key=None):
+    if analysis is None:
+        analysis = analyze(stego_image, level)
+    return payload.read(lambda n: extract_bits(stego_image, n, level, analysis, key))
+
+if __name__ == '__main__':
+    import cv2
+    import matplotlib.pyplot as plt
+    from .images import load_image
+
+    image = load_image('lena.png')
+
+    # Embed secret text
+    stego_text_image = embed(image, "TRY TO FIND ME")
+    print('Extracted:', extract(stego_text_image).to_text())
+    print(f"PSNR: {calculate_PSNR(image, stego_text_image)} dB")
+
+    # Embed secret image (baboon, in colour, reduced to fit one bit per HH coefficient)
+    secret_image = load_image('baboon.png')
+    secret_image = cv2.resize(secret_image, (secret_image.shape[1] // 16, secret_image.shape[0] // 16))
+    stego_image_image = embed(image, secret_image)
+    print(f"PSNR: {calculate_PSNR(image, stego_image_image)} dB")
+
+    # Create a figure with two subplots
+    fig, axs = plt.subplots(1, 2, figsize=(10, 5))
+
+    # Plot stego text image
+    axs[0].imshow(stego_text_image, cmap='gray')
+    axs[0].set_title('Stego Image (secret is text) dhwt')
+
+    # Plot stego image
+    axs[1].imshow(stego_image_image, cmap='gray')
+    axs[1].set_title('Stego Image (secret is "babbon") dhwt')
+
+    # Display the figure
+    plt.show()
@@ -0,0 +1,34 @@
+import os
+import numpy as np
+from .png import write_png
+
+# Image file helpers shared by the batch tools. PIL is imported on first use.
+
+IMAGE_EXTENSIONS = ('.png', '.bmp', '.tif', '.tiff', '.jpg', '.jpeg')
+# Modes the engines work on as they are: HxW or HxWxC uint8
+NATIVE_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+def is_jpeg(path):
+    return path.lower().endswith(('.jpg', '.jpeg'))
+
+def load_image(path, mode=None):
+    # Colour and alpha are kept (mode None). Other modes (palette, CMYK, ...)
+    # become RGB, or RGBA when the image has transparency.
+    from PIL import Image
+    with Image.open(path) as image:
+        if mode is None:
+            if image.mode in NATIVE_MODES:
+                mode = image.mode
+            elif image.mode == '1':
+                mode = 'L'
+            else:
+                mode = 'RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB'
+        return np.array(image.convert(mode))
+
+def save_image(path, array, **options):
+    # PNG through png.write_png (level, filter, strategy, chunks=ancillary chunks to copy)
+    write_png(path, array, **options)
+
+def list_images(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
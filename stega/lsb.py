@@ -0,0 +1,144 @@
+import numpy as np
+from . import matrix as hamming, metrics, payload, permute
+
+# With matrix=True the payload goes into the LSB plane with a Hamming code
+# (see matrix.py): up to k bits per change instead of about 2, k chosen from
+# the payload size. n_bits is then 1.
+
+def capacity(image, n_bits=1, matrix=False):
+    # Number of payload bits the cover can carry (every channel of every pixel)
+    if matrix:
+        return hamming.capacity(np.asarray(image).size)
+    return np.asarray(image).size * n_bits
+
+def row_alignment():
+    # Any horizontal strip of the cover can be embedded on its own
+    return 1
+
+def check_options(n_bits, matrix):
+    if not 1 <= n_bits <= 4:
+        raise ValueError("n_bits must be between 1 and 4")
+    if matrix and n_bits != 1:
+        raise ValueError("matrix embedding uses the LSB plane only (n_bits=1)")
+
+def samples(flat, key, count):
+    # The first count samples in embedding order
+    if key is None:
+        return flat[:count]
+    return flat[permute.positions(flat.size, key, count)]
+
+def embed_bits(image, bits, n_bits=1, key=None, matrix=False):
+    check_options(n_bits, matrix)
+    stego = np.array(image, dtype=np.uint8, copy=True)
+    if len(bits) > capacity(stego, n_bits, matrix):
+        raise ValueError(f"Secret needs {len(bits)} bits but the cover only holds {capacity(stego, n_bits, matrix)}")
+    if matrix:
+        return embed_matrix(stego, bits, key)
+
+    # Group the bits n_bits at a time (zero padded) into the values to write
+    n_values = -(-len(bits) // n_bits)
+    groups = np.zeros(n_values * n_bits, dtype=np.uint8)
+    groups[:len(bits)] = bits
+    weights = (1 << np.arange(n_bits - 1, -1, -1)).astype(np.uint8)
+    values = groups.reshape(-1, n_bits) @ weights
+
+    # Clear the low bits of the first n_values samples in place, then set them
+    flat = stego.reshape(-1)
+    clear = np.uint8(0xFF ^ ((1 << n_bits) - 1))
+    values = values.astype(np.uint8)
+    if key is None:
+        flat[:n_values] &= clear
+        flat[:n_values] |= values
+    else:
+        for start, positions in permute.Permutation(flat.size, key).chunks(n_values):
+            flat[positions] = (flat[positions] & clear) | values[start:start + len(positions)]
+    return stego
+
+def embed_matrix(stego, bits, key, k=None, preamble=True):
+    # Flip only the LSBs the Hamming code asks for. Tiled mode gives k (one
+    # code for the whole payload) and writes the preamble in the first strip only.
+    flat = stego.reshape(-1)
+    if k is None:
+        k = hamming.choose_k(len(bits), flat.size)
+    count = hamming.slots_needed(len(bits), k, preamble)
+    positions = None if key is None else permute.positions(flat.size, key, count)
+    changed = hamming.changes((flat[:count] if positions is None else flat[positions]) & 1, bits, k, preamble)
+    flat[changed if positions is None else positions[changed]] ^= 1
+    return stego
+
+def extract_matrix(flat, n, key, k=None):
+    # A cover filled with a k > 1 code holds fewer bits than its capacity: only those are returned.
+    # With k given (tiled mode, strips after the first), there is no preamble.
+    preamble = k is None
+    if preamble:
+        if flat.size < hamming.K_BITS:
+            raise ValueError(f"Cannot read {n} bits from an image holding {capacity(flat, matrix=True)}")
+        k = hamming.read_k(samples(flat, key, hamming.K_BITS) & 1)
+    count = min(hamming.slots_needed(n, k, preamble), flat.size)
+    return hamming.decode(samples(flat, key, count) & 1, n, k, preamble)
+
+def extract_bits(stego_image, n, n_bits=1, key=None, matrix=False):
+    check_options(n_bits, matrix)
+    flat = np.asarray(stego_image, dtype=np.uint8).reshape(-1)
+    if matrix:
+        if n > capacity(flat, matrix=True):
+            raise ValueError(f"Cannot read {n} bits from an image holding {capacity(flat, matrix=True)}")
+        return extract_matrix(flat, n, key)
+    n_values = -(-n // n_bits)
+    if n_values > flat.size:
+        raise ValueError(f"Cannot read {n} bits from an image holding {capacity(flat, n_bits)}")
+
+    if key is None:
+        values = flat[:n_values]
+    else:
+        values = np.empty(n_values, dtype=np.uint8)
+        for start, positions in permute.Permutation(flat.size, key).chunks(n_values):
+            values[start:start + len(positions)] = flat[positions]
+    values = values & np.uint8((1 << n_bits) - 1)
+    # Keep the n_bits lowest bits of each byte, most significant first
+    bits = np.unpackbits(values[:, None], axis=1)[:, 8 - n_bits:]
+    return bits.reshape(-1)[:n]
+
+def embed(image, secret_data, n_bits=1, key=None, matrix=False):
+    return embed_bits(image, payload.from_secret(secret_data, 'LSB').bits, n_bits, key, matrix)
+
+def extract(stego_image, n_bits=1, key=None, matrix=False):
+    return payload.read(lambda n: extract_bits(stego_image, n, n_bits, key, matrix))
+
+def calculate_mse_psnr(original_img, stego_image):
+    quality = metrics.quality(original_img, stego_image, ('mse', 'psnr'))
+    print('MSE:', quality['mse'], 'PSNR:', quality['psnr'])
+    return quality['mse'], quality['psnr']
+
+if __name__ == '__main__':
+    import cv2
+    import matplotlib.pyplot as plt
+    from .images import load_image
+
+    original_image = load_image('lena.png')
+    secret_text = "TRY TO FIND ME"
+    secret_image = load_image('baboon.png')
+    # Quarter size (minus the header) so the 4 channels of 8 bits of the secret fit in 2 bits per pixel of the cover
+    secret_image = cv2.resize(secret_image, (secret_image.shape[1] // 4, secret_image.shape[0] // 4 - 1))
+
+    # Embed secret text
+    stego_text_image = embed(original_image, secret_text)
+    print('Extracted:', extract(stego_text_image).to_text())
+
+    # Embed secret image
+    stego_image_image = embed(original_image, secret_image, n_bits=2)
+    calculate_mse_psnr(original_image, stego_image_image)
+
+    # Create a figure with two subplots
+    fig, axs = plt.subplots(1, 2, figsize=(10, 5))
+
+    # Plot stego text image
+    axs[0].imshow(stego_text_image, cmap='gray')
+    axs[0].set_title('Stego Image (secret is text) LSB')
+
+    # Plot stego image
+    axs[1].imshow(stego_image_image, cmap='gray')
+    axs[1].set_title('Stego Image (secret is "baboon") LSB')
+
+    # Display the figure
+    plt.show()
@@ -0,0 +1,58 @@
+import numpy as np
+
+# Matrix embedding with (1, 2^k - 1, k) Hamming codes: k payload bits go into
+# the syndrome of a group of 2^k - 1 cover LSBs, changing at most one of them.
+# k is chosen from the payload/capacity ratio and stored in the first K_BITS
+# LSBs as plain bits (k - 1), in front of the groups.
+
+K_BITS = 4
+MAX_K = 12
+
+def syndromes(lsbs, n):
+    # Syndrome of every group of n = 2^k - 1 LSBs: XOR of the 1-based positions holding a 1
+    # (positions fit 16 bits for k <= MAX_K: no int64 copy of the LSBs)
+    groups = lsbs[:len(lsbs) // n * n].reshape(-1, n)
+    return np.bitwise_xor.reduce(groups * np.arange(1, n + 1, dtype=np.uint16), axis=1)
+
+def to_values(bits, k):
+    padded = np.zeros(-(-len(bits) // k) * k, dtype=np.int64)
+    padded[:len(bits)] = bits
+    return padded.reshape(-1, k) @ (1 << np.arange(k - 1, -1, -1))
+
+def to_bits(values, k):
+    return ((values[:, None] >> np.arange(k - 1, -1, -1)) & 1).astype(np.uint8).reshape(-1)
+
+def capacity(n_slots):
+    # Payload bits with k = 1, i.e. one bit per LSB after the preamble
+    return max(n_slots - K_BITS, 0)
+
+def choose_k(n_bits, n_slots):
+    # Largest code whose groups still fit the LSBs left after the preamble
+    for k in range(MAX_K, 1, -1):
+        if -(-n_bits // k) * ((1 << k) - 1) <= n_slots - K_BITS:
+            return k
+    return 1
+
+def slots_needed(n_bits, k, preamble=True):
+    return (K_BITS if preamble else 0) + -(-n_bits // k) * ((1 << k) - 1)
+
+def changes(lsbs, bits, k, preamble=True):
+    # Indices of the LSBs (preamble included) to flip so that lsbs carries k
+    # then bits. lsbs holds at least slots_needed(len(bits), k) values.
+    # Without preamble, only the groups (strips after the first in tiled mode).
+    n = (1 << k) - 1
+    start = K_BITS if preamble else 0
+    flipped = np.flatnonzero(lsbs[:start] != to_bits(np.array([k - 1]), K_BITS)[:start])
+    values = to_values(bits, k)
+    flips = syndromes(lsbs[start:start + len(values) * n], n) ^ values
+    # Changing the LSB at position s flips the syndrome by s: one change per group at most
+    changed = np.flatnonzero(flips)
+    return np.concatenate([flipped, start + changed * n + flips[changed] - 1])
+
+def read_k(preamble):
+    return int(np.asarray(preamble[:K_BITS], dtype=np.int64) @ (1 << np.arange(K_BITS - 1, -1, -1))) + 1
+
+def decode(lsbs, n, k, preamble=True):
+    # First n payload bits of lsbs (preamble included unless preamble=False), or as many groups as it holds
+    size = (1 << k) - 1
+    return to_bits(syndromes(lsbs[K_BITS if preamble else 0:slots_needed(n, k, preamble)], size), k)[:n]
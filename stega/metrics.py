@@ -0,0 +1,110 @@
+import numpy as np
+
+# Image quality metrics. Differences are taken in int32 (or float64 for float
+# images), never on the uint8 arrays themselves (which would wrap around).
+#
+# quality() computes every metric in one pass over strips of rows, so memory
+# stays bounded on large images; subsample=s keeps one pixel out of s in both
+# directions for a faster estimate. Images can be HxW or HxWxC.
+
+DEFAULT_BLOCK_ROWS = 512
+ALL_METRICS = ('mse', 'psnr', 'ssim', 'histogram')
+
+def difference(original, stego):
+    if original.dtype.kind in 'ui' and stego.dtype.kind in 'ui':
+        return original.astype(np.int32) - stego
+    return original.astype(np.float64) - stego
+
+def box_sum(x, size):
+    # Sum over every size x size window (valid positions only), one axis at a
+    # time with cumulative sums in the dtype of x (exact for int64 input)
+    total = np.cumsum(x, axis=0)
+    rows = total[size - 1:].copy()
+    rows[1:] -= total[:-size]
+    total = np.cumsum(rows, axis=1)
+    window = total[:, size - 1:].copy()
+    window[:, 1:] -= total[:, :-size]
+    return window
+
+def ssim_map(original, stego, window, peak):
+    # Structural similarity of every window x window square of the two strips.
+    # Window sums of integer images are exact, so variances and covariance are
+    # taken as n * sum(xy) - sum(x) * sum(y) without cancellation error.
+    integer = original.dtype.kind in 'ui' and stego.dtype.kind in 'ui'
+    x = original.astype(np.int64 if integer else np.float64)
+    y = stego.astype(np.int64 if integer else np.float64)
+    n = window * window
+    sum_x = box_sum(x, window)
+    sum_y = box_sum(y, window)
+    covariance = n * box_sum(x * y, window) - sum_x * sum_y
+    variances = n * (box_sum(x * x, window) + box_sum(y * y, window)) - sum_x * sum_x - sum_y * sum_y
+    c1 = (0.01 * peak * n) ** 2
+    c2 = (0.03 * peak * n) ** 2
+    means = 2.0 * sum_x * sum_y
+    return ((means + c1) * (2.0 * covariance + c2)) / ((sum_x * sum_x + sum_y * sum_y + c1) * (variances + c2))
+
+def histogram(pixels):
+    # 256 bins per channel
+    channels = pixels.shape[2] if pixels.ndim == 3 else 1
+    values = pixels.astype(np.intp).reshape(-1, channels) + 256 * np.arange(channels)
+    return np.bincount(values.reshape(-1), minlength=256 * channels)
+
+def quality(original, stego, metrics=ALL_METRICS, window=7, peak=255, block_rows=DEFAULT_BLOCK_ROWS, subsample=1):
+    # Dict of the requested metrics: mse, psnr, ssim (mean over sliding
+    # window x window squares) and histogram (share of pixels that would have
+    # to change value for the histograms to match, per channel, uint8 images only)
+    x = np.asarray(original)[::subsample, ::subsample]
+    y = np.asarray(stego)[::subsample, ::subsample]
+    if x.shape != y.shape:
+        raise ValueError(f"Images have different shapes: {x.shape} and {y.shape}")
+    height = x.shape[0]
+    window = min(window, x.shape[0], x.shape[1])
+    squared = 0
+    ssim_total = 0.0
+    ssim_count = 0
+    histogram_x = histogram_y = 0
+
+    for start in range(0, height, block_rows):
+        end = min(start + block_rows, height)
+        if 'mse' in metrics or 'psnr' in metrics:
+            d = difference(x[start:end], y[start:end])
+            squared += (d * d).sum()
+        if 'histogram' in metrics:
+            histogram_x += histogram(x[start:end])
+            histogram_y += histogram(y[start:end])
+        if 'ssim' in metrics and start <= height - window:
+            # window - 1 rows of overlap so every window starting in this strip is complete
+            stop = min(end + window - 1, height)
+            scores = ssim_map(x[start:stop], y[start:stop], window, peak)[:end - start]
+            ssim_total += float(scores.sum())
+            ssim_count += scores.size
+
+    result = {}
+    error = float(squared) / x.size if x.size else 0.0
+    if 'mse' in metrics:
+        result['mse'] = error
+    if 'psnr' in metrics:
+        result['psnr'] = float('inf') if error == 0 else float(10 * np.log10(peak ** 2 / error))
+    if 'ssim' in metrics:
+        result['ssim'] = ssim_total / ssim_count if ssim_count else 1.0
+    if 'histogram' in metrics:
+        result['histogram'] = float(np.abs(histogram_x - histogram_y).sum()) / (2 * x.size) if x.size else 0.0
+    return result
+
+def mse(original, stego, **options):
+    return quality(original, stego, ('mse',), **options)['mse']
+
+def psnr(original, stego, peak=255, **options):
+    return quality(original, stego, ('psnr',), peak=peak, **options)['psnr']
+
+def ssim(original, stego, window=7, peak=255, **options):
+    return quality(original, stego, ('ssim',), window=window, peak=peak, **options)['ssim']
+
+def histogram_difference(original, stego, **options):
+    return quality(original, stego, ('histogram',), **options)['histogram']
+
+def bit_error_rate(expected, actual):
+    expected = np.asarray(expected)
+    if len(expected) == 0:
+        return 0.0
+    return float(np.mean(expected != np.asarray(actual)[:len(expected)]))
@@ -0,0 +1,71 @@
+from functools import cached_property
+import numpy as np
+from . import container
+
+# Every bitstream is a container frame (see container.py): header with the
+# kind, length, compression and CRC32 of the secret, then the secret itself.
+
+class Bitstream:
+    # Payload bits as a flat uint8 array of 0/1 values, frame header included.
+    # Embedders read self.bits directly; the secret bytes are never turned into strings.
+    # bits takes one byte per bit, 8x the frame: against the old '0'/'1'
+    # strings that is a gain for image secrets (one Python string per pixel)
+    # only, text and bytes took one character per bit already. The streaming
+    # engines (tiled, video) also hold the whole unpacked payload.
+
+    def __init__(self, data, kind='bytes', shape=None, method=None, compression='auto'):
+        self.data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        self.kind = kind
+        self.shape = tuple(shape) if shape else None
+        self.method = method
+        self.compression = compression
+
+    @cached_property
+    def bits(self):
+        # Built on first use only: extracted bitstreams never need it
+        frame = container.encode(self.data, self.kind, self.method, self.compression, self.shape)
+        return np.unpackbits(np.frombuffer(frame, dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.bits)
+
+    def to_bytes(self):
+        return self.data.tobytes()
+
+    def to_text(self):
+        return self.to_bytes().decode('utf-8')
+
+    def to_image(self, shape=None):
+        return self.data.reshape(shape or self.shape)
+
+def from_secret(secret_data, method=None, compression='auto'):
+    if isinstance(secret_data, Bitstream):
+        if method is None or secret_data.method == method.upper():
+            return secret_data
+        return Bitstream(secret_data.data, secret_data.kind, secret_data.shape, method.upper(), secret_data.compression)
+    if method:
+        method = method.upper()
+    if isinstance(secret_data, str):
+        # Text is stored as UTF-8
+        return Bitstream(secret_data.encode('utf-8'), 'text', None, method, compression)
+    if isinstance(secret_data, np.ndarray):
+        # Pixel values of the secret image, one byte each (no copy for contiguous uint8 arrays)
+        image = np.ascontiguousarray(secret_data, dtype=np.uint8)
+        return Bitstream(image.reshape(-1), 'image', image.shape, method, compression)
+    if isinstance(secret_data, (bytes, bytearray, memoryview)):
+        return Bitstream(secret_data, 'bytes', None, method, compression)
+    raise ValueError("Invalid type for secret_data. Supported types are str (text), bytes and numpy.ndarray (image).")
+
+def read(read_bits):
+    # read_bits(n) must return the first n embedded bits. The frame is read
+    # piece by piece: fixed header, image shape, body, and no further.
+    position = 0
+
+    def read_bytes(n):
+        nonlocal position
+        bits = read_bits((position + n) * 8)[position * 8:]
+        position += n
+        return np.packbits(bits).tobytes()
+
+    frame = container.read_frame(read_bytes)
+    return Bitstream(frame.data, frame.kind, frame.shape, frame.method, frame.compression)
@@ -0,0 +1,98 @@
+import hashlib
+import numpy as np
+
+# Keyed scattering of embedding positions. Permutation(size, key) is a
+# pseudo-random bijection of [0, size) computed index by index: a balanced
+# Feistel network over the smallest power of 4 holding size, with cycle
+# walking for the values that land outside. Positions are generated in
+# chunks, so no index array the size of the cover is ever built.
+#
+# Every engine takes key=None: without a key bits go to the positions in
+# order, with one the i-th bit goes to the permuted position i. Both sides
+# get the same order as long as they see the same position space.
+
+ROUNDS = 4
+CHUNK = 1 << 20
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+
+def key_bytes(key):
+    if isinstance(key, bytes):
+        return key
+    return str(key).encode('utf-8')
+
+class Permutation:
+    def __init__(self, size, key, rounds=ROUNDS):
+        self.size = int(size)
+        self.half = max((self.size - 1).bit_length() + 1, 2) // 2
+        self.mask = np.uint64((1 << self.half) - 1)
+        # Round keys depend on the size too: position spaces of different sizes get unrelated orders
+        h = hashlib.blake2b(key_bytes(key), digest_size=8 * rounds, person=b'stega-permute')
+        h.update(str(self.size).encode())
+        self.round_keys = np.frombuffer(h.digest(), dtype='<u8').astype(np.uint64)
+
+    def _round(self, right, round_key):
+        # splitmix64 finalizer of the keyed half, cut to the half width (in place on a fresh array)
+        x = right ^ round_key
+        x ^= x >> np.uint64(30)
+        x *= MIX_1
+        x ^= x >> np.uint64(27)
+        x *= MIX_2
+        x ^= x >> np.uint64(31)
+        x &= self.mask
+        return x
+
+    def _encrypt(self, x):
+        half = np.uint64(self.half)
+        left, right = x >> half, x & self.mask
+        for round_key in self.round_keys:
+            f = self._round(right, round_key)
+            f ^= left
+            left, right = right, f
+        left <<= half
+        left |= right
+        return left
+
+    def __call__(self, indices):
+        x = np.asarray(indices, dtype=np.uint64)
+        if len(x) and int(x.max()) >= self.size:
+            raise ValueError(f"Index out of range for a permutation of {self.size}")
+        x = self._encrypt(x)
+        # The network permutes [0, 4^half): walk out-of-range values along their cycle until they are back in range
+        outside = np.flatnonzero(x >= self.size)
+        while len(outside):
+            x[outside] = self._encrypt(x[outside])
+            outside = outside[x[outside] >= self.size]
+        return x.astype(np.int64)
+
+    def indices(self, start, stop):
+        return self(np.arange(start, stop, dtype=np.uint64))
+
+    def chunks(self, count, chunk=CHUNK):
+        # (offset, positions) of the first count permuted positions, chunk by chunk
+        for start in range(0, count, chunk):
+            yield start, self.indices(start, min(start + chunk, count))
+
+def positions(size, key, count):
+    # The first count positions of [0, size), in keyed order when key is set
+    if key is None:
+        return np.arange(count)
+    return Permutation(size, key).indices(0, count)
+
+def select(items, key, count):
+    return items[positions(len(items), key, count)]
+
+def weighted_positions(size, key, weights, n, chunk=CHUNK):
+    # Positions in keyed order, chunk by chunk, until weights(positions) add
+    # up to n (all of them if they never do). For positions carrying a
+    # variable number of bits; the result may go past n by up to a chunk.
+    permutation = Permutation(size, key)
+    parts = []
+    total = 0
+    for start in range(0, size, chunk):
+        if total >= n:
+            break
+        part = permutation.indices(start, min(start + chunk, size))
+        parts.append(part)
+        total += int(weights(part).sum(dtype=np.int64))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
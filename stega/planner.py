@@ -0,0 +1,147 @@
+import hashlib
+import inspect
+import os
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from . import get_module, payload
+
+# Capacity planning and a cache of cover analyses. An analysis is what an
+# engine computes about a cover whatever the payload (PVD range classes and
+# usable pairs, usable DWT/JPEG coefficients) plus its capacity in bits.
+# Embedding many secrets into the same cover templates then skips that stage.
+#
+#   planner.capacity(cover, 'PVD')
+#   planner.fits(cover, secret, 'DCT', step=16)
+#
+# Engines without an analyze function (LSB, DCT) have a capacity that only
+# depends on the cover shape; their analysis is just that number and is
+# not cached.
+#
+# Options are given once for a method and each engine function gets the
+# ones it declares (call). A name no engine function declares is an error.
+
+# Engine functions that take options
+ENGINE_FUNCTIONS = ('analyze', 'capacity', 'row_alignment', 'embed_bits', 'extract_bits', 'embed', 'extract')
+
+@lru_cache(maxsize=None)
+def parameters(function):
+    return inspect.signature(function).parameters
+
+def check_options(module, options):
+    # Options must be keyword parameters (with a default) of some engine function
+    defaults = {name: parameter.default for function in ENGINE_FUNCTIONS if hasattr(module, function)
+                for name, parameter in parameters(getattr(module, function)).items() if parameter.default is not parameter.empty}
+    method = module.__name__.rsplit('.', 1)[-1].upper()
+    unknown = sorted(set(options) - set(defaults) - {'analysis'})
+    if unknown:
+        raise ValueError(f"Unknown option {', '.join(map(repr, unknown))} for {method}, expected some of {', '.join(sorted(set(defaults) - {'analysis'}))}")
+    # Numbers given as text (a typo on the command line or in a query string)
+    for name, value in options.items():
+        if isinstance(defaults.get(name), (int, float)) and isinstance(value, str):
+            raise ValueError(f"Option {name} of {method} must be a number, got {value!r}")
+
+def call(function, *args, **options):
+    # function(*args) with the options it declares
+    declared = parameters(function)
+    return function(*args, **{name: value for name, value in options.items() if name in declared})
+
+def analysis_options(options):
+    # The key only decides where the bits go, not what the cover can hold
+    return {name: value for name, value in options.items() if name != 'key'}
+
+def run_analysis(module, cover, options):
+    check_options(module, options)
+    options = analysis_options(options)
+    if hasattr(module, 'analyze'):
+        return call(module.analyze, cover, **options)
+    return {'capacity': call(module.capacity, cover, **options)}
+
+def engine_options(module, options, analysis):
+    # Keyword arguments for the engine functions, with the analysis when the engine takes one
+    if hasattr(module, 'analyze'):
+        return dict(options, analysis=analysis)
+    return options
+
+def cover_key(cover, method, options):
+    # Content hash of the cover, method and options
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f'{method.upper()} {sorted(options.items())!r}'.encode())
+    if hasattr(cover, 'coefficients'):
+        planes = cover.coefficients
+    else:
+        planes = [np.asarray(cover)]
+    for plane in planes:
+        plane = np.ascontiguousarray(plane)
+        h.update(f'{plane.shape} {plane.dtype.str}'.encode())
+        h.update(plane.data)
+    return h.hexdigest()
+
+class AnalysisCache:
+    # LRU of analyses in memory. With spill_dir, entries pushed out of memory
+    # are saved to spill_dir/<key>.npz and loaded back on the next miss.
+
+    def __init__(self, max_entries=16, spill_dir=None):
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def get(self, cover, method, **options):
+        module = get_module(method)
+        if not hasattr(module, 'analyze'):
+            # Cheaper than hashing the cover
+            return run_analysis(module, cover, options)
+        key = cover_key(cover, method, analysis_options(options))
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        analysis = self._load(key)
+        if analysis is None:
+            self.misses += 1
+            analysis = run_analysis(module, cover, options)
+        else:
+            self.hits += 1
+        self._store(key, analysis)
+        return analysis
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, key + '.npz')
+
+    def _store(self, key, analysis):
+        self.entries[key] = analysis
+        while len(self.entries) > self.max_entries:
+            old_key, old = self.entries.popitem(last=False)
+            if self.spill_dir:
+                self._spill(old_key, old)
+
+    def _spill(self, key, analysis):
+        path = self._path(key)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, **analysis)
+        os.replace(tmp, path)
+
+    def _load(self, key):
+        if not self.spill_dir or not os.path.exists(self._path(key)):
+            return None
+        with np.load(self._path(key)) as data:
+            return {name: data[name].item() if data[name].ndim == 0 else data[name] for name in data.files}
+
+    def clear(self):
+        self.entries.clear()
+
+default_cache = AnalysisCache()
+
+def analyze(cover, method, cache=None, **options):
+    return (cache or default_cache).get(cover, method, **options)
+
+def capacity(cover, method, cache=None, **options):
+    return analyze(cover, method, cache, **options)['capacity']
+
+def fits(cover, secret_data, method, cache=None, **options):
+    # Whether the secret, length header included, fits the cover
+    return len(payload.from_secret(secret_data, method)) <= capacity(cover, method, cache, **options)
@@ -0,0 +1,248 @@
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# PNG writer for stego images (8 bit L, LA, RGB and RGBA arrays).
+#
+# The image is cut into strips of rows, each filtered and deflated on its
+# own (in parallel threads) and ended with a sync flush, so the compressed
+# strips can simply be concatenated: the zlib header, the strips and the
+# final empty block with the Adler-32 of the whole image (combined from the
+# Adler-32 of the strips) each go in their own IDAT chunk. The first row of
+# a strip never uses a filter that looks at the row above, so a strip only
+# depends on its own pixels.
+#
+# Compressed strips are cached by content: writing a stego image whose
+# payload only touched the top rows of a cover written before reuses every
+# strip below. The cache is in memory, per process: it only hits when the
+# same process has already written that cover (the HTTP service, which
+# writes every PNG in its main process, a batch worker embedding several
+# secrets into one template, a script calling write_png in a loop). A
+# command writing a single image, or the first image of a cover in a
+# process, compresses every strip. Ancillary chunks of the cover (gAMA, iCCP, pHYs, text, ...)
+# can be copied over with chunks=ancillary_chunks(cover_file).
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+FILTERS = ('none', 'sub', 'up', 'average', 'paeth', 'adaptive')
+STRATEGIES = {'default': zlib.Z_DEFAULT_STRATEGY, 'filtered': zlib.Z_FILTERED, 'rle': zlib.Z_RLE,
+              'huffman': zlib.Z_HUFFMAN_ONLY}
+DEFAULT_LEVEL = 6
+# Up compresses about as well as adaptive on photographs and costs half as much
+DEFAULT_FILTER = 'up'
+STRIP_BYTES = 256 * 1024
+# Chunks whose content depends on the colour type: only copied when it does not change
+COLOR_CHUNKS = (b'tRNS', b'bKGD', b'hIST', b'sBIT')
+ADLER_BASE = 65521
+
+def chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)))
+
+def read_chunks(data):
+    # [(type, data)] of a PNG file in memory
+    if data[:8] != SIGNATURE:
+        raise ValueError("Not a PNG file")
+    chunks = []
+    position = 8
+    while position + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        chunks.append((kind, data[position + 8:position + 8 + length]))
+        position += 12 + length
+        if kind == b'IEND':
+            break
+    return chunks
+
+def ancillary_chunks(source):
+    # The ancillary chunks of a PNG (path or bytes) as (type, data, before
+    # IDAT, colour type of the image); empty for other formats
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            source = f.read()
+    if source[:8] != SIGNATURE:
+        return []
+    chunks = []
+    color_type = None
+    before = True
+    for kind, data in read_chunks(source):
+        if kind == b'IHDR':
+            color_type = data[9]
+        elif kind == b'IDAT':
+            before = False
+        elif kind[0] & 0x20:
+            chunks.append((kind, data, before, color_type))
+    return chunks
+
+def adler32_combine(adler1, adler2, length2):
+    # Adler-32 of A + B from the Adler-32 of A and B and the length of B (as zlib's adler32_combine)
+    rem = length2 % ADLER_BASE
+    a1, b1 = adler1 & 0xFFFF, adler1 >> 16
+    a2, b2 = adler2 & 0xFFFF, adler2 >> 16
+    a = (a1 + a2 - 1) % ADLER_BASE
+    b = (rem * a1 + b1 + b2 - rem) % ADLER_BASE
+    return a | (b << 16)
+
+def filter_rows(rows, channels, method):
+    # Filter type byte then filtered bytes of every row of a strip. The first
+    # row only gets none or sub, which do not use the row above.
+    x = rows.astype(np.int16)
+    left = np.zeros_like(x)
+    left[:, channels:] = x[:, :-channels]
+    up = np.zeros_like(x)
+    up[1:] = x[:-1]
+    up_left = np.zeros_like(x)
+    up_left[1:] = left[:-1]
+
+    candidates = {'none': x, 'sub': x - left}
+    if method in ('up', 'adaptive'):
+        candidates['up'] = x - up
+    if method in ('average', 'adaptive'):
+        candidates['average'] = x - ((left + up) >> 1)
+    if method in ('paeth', 'adaptive'):
+        pa = np.abs(up - up_left)
+        pb = np.abs(left - up_left)
+        pc = np.abs(left + up - 2 * up_left)
+        candidates['paeth'] = x - np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, up_left))
+
+    types = np.array([FILTERS.index(name) for name in candidates], dtype=np.uint8)
+    filtered = np.stack(list(candidates.values())).astype(np.uint8)
+    if method == 'adaptive':
+        # Smallest sum of the bytes read as signed values, the usual heuristic
+        score = np.abs(filtered.view(np.int8).astype(np.int32)).sum(axis=2)
+        score[2:, 0] = np.iinfo(np.int32).max
+        choice = score.argmin(axis=0)
+    else:
+        choice = np.full(len(x), list(candidates).index(method))
+        choice[0] = min(choice[0], 1)
+    out = np.empty((len(x), x.shape[1] + 1), dtype=np.uint8)
+    out[:, 0] = types[choice]
+    out[:, 1:] = filtered[choice, np.arange(len(x))]
+    return out
+
+class SegmentCache:
+    # LRU of compressed strips, keyed by a hash of the strip pixels, its
+    # shape and the encoder settings. Shared by the writer threads of one
+    # process, never stored on disk (see the header for when it hits).
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            segment = self.entries.get(key)
+            if segment is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return segment
+
+    def put(self, key, segment):
+        with self.lock:
+            if key in self.entries or len(segment[2]) > self.max_bytes:
+                return
+            self.entries[key] = segment
+            self.size += len(segment[2])
+            while self.size > self.max_bytes:
+                _, old = self.entries.popitem(last=False)
+                self.size -= len(old[2])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+default_cache = SegmentCache()
+
+def check_options(pixels, level, filter, strategy):
+    if pixels.dtype != np.uint8 or pixels.ndim not in (2, 3) or (pixels.ndim == 3 and pixels.shape[2] not in COLOR_TYPES):
+        raise ValueError(f"PNG output needs an HxW or HxWxC (C = 1 to 4) uint8 array, got {pixels.dtype} {pixels.shape}")
+    if not 0 <= level <= 9:
+        raise ValueError("level must be between 0 and 9")
+    if filter not in FILTERS:
+        raise ValueError(f"Unknown filter {filter!r}, expected one of {', '.join(FILTERS)}")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {', '.join(STRATEGIES)}")
+
+def encode_strip(rows, channels, level, filter, strategy, cache):
+    # (raw length, Adler-32, IDAT chunk) of one strip
+    key = None
+    if cache is not None:
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f'{rows.shape} {level} {filter} {strategy}'.encode())
+        h.update(np.ascontiguousarray(rows).data)
+        key = h.digest()
+        segment = cache.get(key)
+        if segment is not None:
+            return segment
+    raw = filter_rows(rows.reshape(len(rows), -1), channels, filter).tobytes()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 9, STRATEGIES[strategy])
+    data = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    segment = (len(raw), zlib.adler32(raw), chunk(b'IDAT', data))
+    if cache is not None:
+        cache.put(key, segment)
+    return segment
+
+def iter_png(pixels, level=DEFAULT_LEVEL, filter=DEFAULT_FILTER, strategy='default', chunks=(), cache=default_cache,
+             workers=None, strip_bytes=STRIP_BYTES):
+    # The PNG file piece by piece, strips compressed ahead by the worker threads
+    pixels = np.asarray(pixels)
+    check_options(pixels, level, filter, strategy)
+    height, width = pixels.shape[:2]
+    channels = pixels.shape[2] if pixels.ndim == 3 else 1
+    color_type = COLOR_TYPES[channels]
+    yield SIGNATURE + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+    chunks = [c for c in chunks if c[0] not in COLOR_CHUNKS or c[3] == color_type]
+    for kind, data, before, _ in chunks:
+        if before:
+            yield chunk(kind, data)
+
+    # zlib header with the FLEVEL of the compression level
+    flevel = 0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3
+    header = 0x7800 | flevel << 6
+    yield chunk(b'IDAT', struct.pack('>H', header + 31 - header % 31))
+    strip_rows = max(strip_bytes // max(width * channels, 1), 1)
+    starts = range(0, height, strip_rows)
+    workers = workers or min(os.cpu_count() or 1, len(starts)) or 1
+    adler = 1
+    with ThreadPoolExecutor(workers) as pool:
+        # At most 2 strips per thread compressed ahead of the one written
+        pending = deque()
+        for start in starts:
+            pending.append(pool.submit(encode_strip, pixels[start:start + strip_rows], channels, level, filter,
+                                       strategy, cache))
+            if len(pending) > 2 * workers:
+                length, strip_adler, idat = pending.popleft().result()
+                adler = adler32_combine(adler, strip_adler, length)
+                yield idat
+        while pending:
+            length, strip_adler, idat = pending.popleft().result()
+            adler = adler32_combine(adler, strip_adler, length)
+            yield idat
+    # Final empty block and the Adler-32 of the filtered data
+    yield chunk(b'IDAT', b'\x03\x00' + struct.pack('>I', adler))
+
+    for kind, data, before, _ in chunks:
+        if not before:
+            yield chunk(kind, data)
+    yield chunk(b'IEND', b'')
+
+def encode_png(pixels, **options):
+    return b''.join(iter_png(pixels, **options))
+
+def write_png(path, pixels, **options):
+    # Written next to the target then renamed, so a crash never leaves a half written file
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        for data in iter_png(pixels, **options):
+            f.write(data)
+    os.replace(tmp, path)
@@ -0,0 +1,171 @@
+import numpy as np
+from . import payload, permute
+
+# Wu-Tsai range table: lower bound and width of each difference range.
+# A pair whose |difference| falls in range k carries log2(width) bits.
+RANGE_LOWER = np.array([0, 8, 16, 32, 64, 128], dtype=np.int16)
+RANGE_WIDTH = np.array([8, 8, 16, 32, 64, 128], dtype=np.int16)
+RANGE_BITS = np.log2(RANGE_WIDTH).astype(np.int8)
+
+def split_pairs(image):
+    # Horizontally adjacent, non overlapping pixel pairs of every row as int16.
+    # In a colour image each channel pairs with the same channel of the
+    # neighbour, channels interleaved (row, pair, channel order). An odd last
+    # column is not used.
+    image = np.asarray(image)
+    width = image.shape[1] - image.shape[1] % 2
+    channels = image.shape[2] if image.ndim == 3 else 1
+    pairs = image[:, :width].astype(np.int16).reshape(image.shape[0], width // 2, 2, channels)
+    pairs = pairs.transpose(0, 1, 3, 2).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+def merge_pairs(image, p1, p2):
+    stego = np.array(image, dtype=np.uint8, copy=True)
+    width = stego.shape[1] - stego.shape[1] % 2
+    channels = stego.shape[2] if stego.ndim == 3 else 1
+    pairs = np.stack([p1, p2], axis=-1).reshape(stego.shape[0], width // 2, channels, 2).transpose(0, 1, 3, 2)
+    stego[:, :width] = pairs.reshape(stego[:, :width].shape)
+    return stego
+
+def calculate_differences(p1, p2):
+    return p2 - p1
+
+def classify(differences):
+    # Range index (smoothness class) of every difference
+    return (np.searchsorted(RANGE_LOWER, np.abs(differences), side='right') - 1).astype(np.int8)
+
+def new_pair_values(p1, p2, differences, target):
+    # Move both pixels so that p2 - p1 == target, splitting the change m between them
+    m = target - differences
+    ceil_half = -(-m // 2)
+    floor_half = m // 2
+    odd = differences % 2 != 0
+    q1 = np.where(odd, p1 - ceil_half, p1 - floor_half)
+    q2 = np.where(odd, p2 + floor_half, p2 + ceil_half)
+    return q1, q2
+
+def signed_target(differences, magnitude):
+    return np.where(differences < 0, -magnitude, magnitude)
+
+def usable_pairs(p1, p2, differences, classes):
+    # Fall-off test: a pair is used only if moving it to the upper bound of its
+    # range keeps both pixels in [0, 255]. Embedding preserves the range and the
+    # outcome of this test, so the extractor finds the same pairs.
+    upper = RANGE_LOWER[classes] + RANGE_WIDTH[classes] - 1
+    q1, q2 = new_pair_values(p1, p2, differences, signed_target(differences, upper))
+    return (q1 >= 0) & (q1 <= 255) & (q2 >= 0) & (q2 <= 255)
+
+def analyze(image):
+    # What embedding needs to know about a cover whatever the payload:
+    # range class of every pair and the pairs passing the fall-off test
+    p1, p2 = split_pairs(image)
+    differences = calculate_differences(p1, p2)
+    classes = classify(differences)
+    usable = np.flatnonzero(usable_pairs(p1, p2, differences, classes))
+    return {'classes': classes, 'usable': usable, 'capacity': int(RANGE_BITS[classes[usable]].sum(dtype=np.int64))}
+
+def capacity(image, analysis=None):
+    return (analyze(image) if analysis is None else analysis)['capacity']
+
+def row_alignment():
+    # Pairs never span two rows
+    return 1
+
+def pairs_needed(bit_counts, n):
+    # Smallest number of pairs whose cumulative capacity reaches n bits
+    ends = np.cumsum(bit_counts, dtype=np.int64)
+    if n > (ends[-1] if len(ends) else 0):
+        raise ValueError(f"Secret needs {n} bits but the cover only holds {ends[-1] if len(ends) else 0}")
+    count = int(np.searchsorted(ends, n)) + 1 if n else 0
+    return count, ends[:count] - bit_counts[:count]
+
+def keyed_order(classes, usable, key, n):
+    # Enough usable pairs, in keyed order, to hold n bits
+    return usable[permute.weighted_positions(len(usable), key, lambda i: RANGE_BITS[classes[usable[i]]], n)]
+
+def bit_shifts(bit_counts, starts):
+    # For every bit of the stream, its shift inside the value of the pair holding it
+    # (most significant bit first). Costs a few bytes per bit, not per pair * MAX_BITS.
+    total = int(starts[-1] + bit_counts[-1]) if len(starts) else 0
+    position = np.arange(total) - np.repeat(starts, bit_counts)
+    return (np.repeat(bit_counts - 1, bit_counts) - position).astype(np.uint8)
+
+def embed_bits(image, bits, analysis=None, key=None):
+    if analysis is None:
+        analysis = analyze(image)
+    classes, usable = analysis['classes'], analysis['usable']
+    if key is not None:
+        usable = keyed_order(classes, usable, key, len(bits))
+    p1, p2 = split_pairs(image)
+    differences = calculate_differences(p1, p2)
+    bit_counts = RANGE_BITS[classes[usable]]
+    count, starts = pairs_needed(bit_counts, len(bits))
+    selected = usable[:count]
+    t = bit_counts[:count]
+
+    # Read t bits for every selected pair (the last pair is zero padded)
+    shifts = bit_shifts(t, starts)
+    padded = np.zeros(len(shifts), dtype=np.uint8)
+    padded[:len(bits)] = bits
+    values = np.add.reduceat(padded << shifts, starts) if count else np.zeros(0, dtype=np.uint8)
+
+    d = differences[selected]
+    target = signed_target(d, RANGE_LOWER[classes[selected]] + values.astype(np.int16))
+    q1, q2 = new_pair_values(p1[selected], p2[selected], d, target)
+    p1[selected] = q1
+    p2[selected] = q2
+    return merge_pairs(image, p1, p2)
+
+def extract_bits(stego_image, n, analysis=None, key=None):
+    if analysis is None:
+        analysis = analyze(stego_image)
+    classes, usable = analysis['classes'], analysis['usable']
+    if key is not None:
+        usable = keyed_order(classes, usable, key, n)
+    p1, p2 = split_pairs(stego_image)
+    differences = calculate_differences(p1, p2)
+    bit_counts = RANGE_BITS[classes[usable]]
+    count, starts = pairs_needed(bit_counts, n)
+    selected = usable[:count]
+    t = bit_counts[:count]
+
+    values = (np.abs(differences[selected]) - RANGE_LOWER[classes[selected]]).astype(np.uint8)
+    return ((np.repeat(values, t) >> bit_shifts(t, starts)) & 1)[:n]
+
+def embed(image, secret_data, analysis=None, key=None):
+    return embed_bits(image, payload.from_secret(secret_data, 'PVD').bits, analysis, key)
+
+def extract(stego_image, analysis=None, key=None):
+    if analysis is None:
+        analysis = analyze(stego_image)
+    return payload.read(lambda n: extract_bits(stego_image, n, analysis, key))
+
+if __name__ == '__main__':
+    import cv2
+    import matplotlib.pyplot as plt
+    from .images import load_image
+
+    original_image = load_image('lena.png')
+
+    # Embed secret text
+    stego_text_image = embed(original_image, "TRY TO FIND ME")
+    print('Extracted:', extract(stego_text_image).to_text())
+
+    # Embed secret image (baboon, in colour, at an eighth of its size: the whole image does not fit)
+    secret_image = load_image('baboon.png')
+    secret_image = cv2.resize(secret_image, (secret_image.shape[1] // 8, secret_image.shape[0] // 8))
+    stego_image_image = embed(original_image, secret_image)
+
+    # Create a figure with two subplots
+    fig, axs = plt.subplots(1, 2, figsize=(10, 5))
+
+    # Plot stego text image
+    axs[0].imshow(stego_text_image, cmap='gray')
+    axs[0].set_title('Stego Image (secret is text) PDV')
+
+    # Plot stego image
+    axs[1].imshow(stego_image_image, cmap='gray')
+    axs[1].set_title('Stego Image (secret is "baboon") PDV')
+
+    # Display the figure
+    plt.show()
@@ -0,0 +1,177 @@
+import numpy as np
+
+# Reed-Solomon codes over GF(256) (primitive polynomial 0x11d, roots
+# alpha^0 .. alpha^(nsym - 1)), shortened to any codeword length up to 255.
+# A codeword is the message followed by nsym parity bytes and corrects
+# errors and erasures (bytes known to be unreliable) as long as
+# 2 * errors + erasures <= nsym.
+#
+# Encoding and syndromes are vectorized over all codewords; only the
+# codewords with a non zero syndrome go through Berlekamp-Massey, the Chien
+# search and Forney's formula. Polynomials in the decoder are lists with the
+# constant term first.
+
+PRIMITIVE = 0x11d
+
+def _tables():
+    exp = np.zeros(512, dtype=np.int64)
+    log = np.zeros(256, dtype=np.int64)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= PRIMITIVE
+    exp[255:510] = exp[:255]
+    return exp, log
+
+EXP, LOG = _tables()
+
+def gf_mul(a, b):
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    return np.where((a == 0) | (b == 0), 0, EXP[LOG[a] + LOG[b]])
+
+def mul(a, b):
+    return 0 if a == 0 or b == 0 else int(EXP[LOG[a] + LOG[b]])
+
+def div(a, b):
+    if b == 0:
+        raise ZeroDivisionError("division by zero in GF(256)")
+    return 0 if a == 0 else int(EXP[(LOG[a] - LOG[b]) % 255])
+
+def power(exponent):
+    return int(EXP[exponent % 255])
+
+def poly_mul(p, q):
+    out = [0] * (len(p) + len(q) - 1)
+    for i, a in enumerate(p):
+        for j, b in enumerate(q):
+            out[i + j] ^= mul(a, b)
+    return out
+
+def poly_eval(p, x):
+    y = 0
+    for coefficient in reversed(p):
+        y = mul(y, x) ^ coefficient
+    return y
+
+def generator(nsym):
+    # prod (x - alpha^i), highest degree first as the encoder uses it
+    g = [1]
+    for i in range(nsym):
+        g = poly_mul(g, [power(i), 1])
+    return np.array(g[::-1], dtype=np.int64)
+
+def encode(messages, nsym):
+    # Codewords (rows) of the messages (rows of bytes): message then parity
+    messages = np.atleast_2d(np.asarray(messages, dtype=np.int64))
+    if messages.shape[1] + nsym > 255:
+        raise ValueError(f"Codewords of {messages.shape[1] + nsym} bytes, the limit is 255")
+    g = generator(nsym)[1:]
+    remainder = np.zeros((len(messages), nsym), dtype=np.int64)
+    # Division by the generator, one message byte at a time for all codewords at once
+    for i in range(messages.shape[1]):
+        feedback = messages[:, i] ^ remainder[:, 0]
+        remainder[:, :-1] = remainder[:, 1:]
+        remainder[:, -1] = 0
+        remainder ^= gf_mul(feedback[:, None], g[None, :])
+    return np.concatenate([messages, remainder], axis=1).astype(np.uint8)
+
+def syndromes(codewords, nsym):
+    # S_j = c(alpha^j) of every codeword (rows), c[0] the highest degree coefficient
+    c = np.atleast_2d(np.asarray(codewords, dtype=np.int64))
+    n = c.shape[1]
+    exponents = np.arange(nsym)[:, None] * np.arange(n - 1, -1, -1)[None, :] % 255
+    terms = np.where(c[:, None, :] != 0, EXP[(LOG[c][:, None, :] + exponents[None]) % 255], 0)
+    return np.bitwise_xor.reduce(terms, axis=2)
+
+def berlekamp_massey(sequence):
+    # Shortest connection polynomial of the sequence and its length
+    c, b = [1], [1]
+    length, shift, last = 0, 1, 1
+    for n, s in enumerate(sequence):
+        d = s
+        for i in range(1, length + 1):
+            if i < len(c):
+                d ^= mul(c[i], sequence[n - i])
+        if d == 0:
+            shift += 1
+            continue
+        previous = list(c)
+        coefficient = div(d, last)
+        c = c + [0] * max(len(b) + shift - len(c), 0)
+        for i, value in enumerate(b):
+            c[i + shift] ^= mul(coefficient, value)
+        if 2 * length <= n:
+            length, b, last, shift = n + 1 - length, previous, d, 1
+        else:
+            shift += 1
+    return c, length
+
+def correct(codeword, syndrome, nsym, erasures=()):
+    # Corrected copy of one codeword, or None when there are too many errors
+    n = len(codeword)
+    syndrome = [int(s) for s in syndrome]
+    locators = [power(n - 1 - p) for p in erasures]
+    gamma = [1]
+    for x in locators:
+        gamma = poly_mul(gamma, [1, x])
+    # Forney syndromes: the erasures taken out, the remaining errors found by Berlekamp-Massey
+    modified = poly_mul(gamma, syndrome)[:nsym]
+    sigma, errors = berlekamp_massey(modified[len(locators):])
+    if 2 * errors + len(locators) > nsym:
+        return None
+    locator = poly_mul(sigma, gamma)
+    while len(locator) > 1 and locator[-1] == 0:
+        locator.pop()
+
+    # Chien search over the codeword positions
+    inverse = [power(-(n - 1 - p)) for p in range(n)]
+    positions = [p for p in range(n) if poly_eval(locator, inverse[p]) == 0]
+    if len(positions) != len(locator) - 1:
+        return None
+
+    # Forney: magnitude at locator X is X * omega(X^-1) / locator'(X^-1)
+    omega = poly_mul(syndrome, locator)[:nsym]
+    derivative = [locator[i] if i % 2 else 0 for i in range(1, len(locator))]
+    corrected = np.array(codeword, dtype=np.int64)
+    for p in positions:
+        denominator = poly_eval(derivative, inverse[p])
+        if denominator == 0:
+            return None
+        corrected[p] ^= mul(power(n - 1 - p), div(poly_eval(omega, inverse[p]), denominator))
+    if syndromes(corrected, nsym).any():
+        return None
+    return corrected.astype(np.uint8)
+
+def decode(codewords, nsym, reliability=None):
+    # Messages of the codewords (rows) and how many codewords could not be
+    # corrected (returned as received). With reliability (same shape, higher
+    # is surer), a codeword is also tried with its 2, 4, .. nsym least
+    # reliable bytes as erasures and the candidate that changes the least
+    # reliability wins (generalized minimum distance): errors-only
+    # correction alone can land on a wrong codeword when there are more than
+    # nsym / 2 errors.
+    codewords = np.array(np.atleast_2d(codewords), dtype=np.uint8)
+    failed = 0
+    all_syndromes = syndromes(codewords, nsym)
+    for row in np.flatnonzero(all_syndromes.any(axis=1)):
+        if reliability is None:
+            fixed = correct(codewords[row], all_syndromes[row], nsym)
+        else:
+            order = np.argsort(reliability[row], kind='stable')
+            best = None
+            for count in range(0, nsym + 1, 2):
+                candidate = correct(codewords[row], all_syndromes[row], nsym, tuple(order[:count]))
+                if candidate is not None:
+                    cost = reliability[row][candidate != codewords[row]].sum()
+                    if best is None or cost < best[0]:
+                        best = cost, candidate
+            fixed = best[1] if best else None
+        if fixed is None:
+            failed += 1
+        else:
+            codewords[row] = fixed
+    return codewords[:, :codewords.shape[1] - nsym], failed
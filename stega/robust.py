@@ -0,0 +1,195 @@
+import numpy as np
+from . import payload, permute, reedsolomon
+from .dct import RGB_TO_YCBCR, apply_dct_blocks, apply_idct_blocks, merge_blocks, quantize, split_blocks
+
+# Embedding that survives JPEG recompression and resizing, for images that
+# go through channels which re-encode them. Far lower capacity than the
+# other methods (about 200 bytes, whatever the cover size, as long as it is at
+# least size x size).
+#
+# The luma of the cover is resampled (area weights) to a size x size working
+# plane. Every bit goes into low frequency DCT coefficients of its 8x8
+# blocks by QIM, which JPEG quantization and resampling mostly preserve. The
+# change of the plane is spread back over the cover with the pseudo-inverse
+# of the resampling, and added to every colour channel alike. The extractor
+# resamples whatever size it gets to the same plane, so a scaled copy is
+# read on the same grid.
+#
+# The payload is cut into Reed-Solomon codewords (codeword bytes with parity
+# of them, see reedsolomon.py) and every code bit is written repeat times,
+# the copies a repeat-th of the plane apart (or scattered by the key). The
+# decoder adds up a soft value per copy, cos(2 pi c / step): +1 on the lattice
+# of 0, -1 on that of 1. The sign gives the bit, and the bytes with the
+# smallest sums are the first erasures when a codeword has too many errors.
+
+LOW_BAND = ((0, 1), (1, 0), (1, 1), (0, 2), (2, 0))
+DEFAULT_SIZE = 512
+DEFAULT_STEP = 36
+DEFAULT_REPEAT = 8
+DEFAULT_CODEWORD = 64
+DEFAULT_PARITY = 16
+BLOCK = 8
+
+def resample_matrix(n, m):
+    # (m, n) matrix taking n samples to m, each output the mean of the interval it covers
+    edges = np.arange(m + 1) * (n / m)
+    start = np.arange(n)
+    overlap = np.minimum(edges[1:, None], start[None, :] + 1) - np.maximum(edges[:-1, None], start[None, :])
+    return np.clip(overlap, 0, None) / (n / m)
+
+def spread_matrix(resample):
+    # Least norm right inverse of a resampling matrix: R.T (R R.T)^-1 when it
+    # downsamples (only an m x m inverse), the pseudo-inverse when it upsamples
+    m, n = resample.shape
+    if n >= m:
+        return resample.T @ np.linalg.inv(resample @ resample.T)
+    return np.linalg.pinv(resample)
+
+def luma(image):
+    image = np.asarray(image, dtype=np.float64)
+    if image.ndim == 2:
+        return image
+    if image.shape[2] >= 3:
+        return image[..., :3] @ RGB_TO_YCBCR[0]
+    return image[..., 0]
+
+def check_options(size, codeword, parity):
+    if size < BLOCK or size % BLOCK:
+        raise ValueError(f"size must be a positive multiple of {BLOCK}")
+    if not 0 < parity < codeword <= 255 or parity % 2:
+        raise ValueError("parity must be even and codeword must be between parity + 1 and 255 bytes")
+
+def code_capacity(size, positions, repeat):
+    # Code bits the plane holds, each written repeat times
+    return (size // BLOCK) ** 2 * len(positions) // repeat
+
+def capacity(image, size=DEFAULT_SIZE, positions=LOW_BAND, repeat=DEFAULT_REPEAT, codeword=DEFAULT_CODEWORD,
+             parity=DEFAULT_PARITY):
+    # Payload bits in whole codewords; the same for every cover at least size x size
+    check_options(size, codeword, parity)
+    if min(np.shape(image)[:2]) < size:
+        return 0
+    codewords = code_capacity(size, positions, repeat) // (8 * codeword)
+    return codewords * (codeword - parity) * 8
+
+def encode(bits, codeword=DEFAULT_CODEWORD, parity=DEFAULT_PARITY):
+    # Code bits of the payload bits: whole codewords, the last message zero padded
+    data = np.packbits(np.asarray(bits, dtype=np.uint8))
+    k = codeword - parity
+    messages = np.zeros(-(-len(data) // k) * k, dtype=np.uint8)
+    messages[:len(data)] = data
+    return np.unpackbits(reedsolomon.encode(messages.reshape(-1, k), parity).reshape(-1))
+
+def slots(n, size, positions, repeat, key):
+    # (repeat, n) coefficient slots of the copies of the first n code bits
+    total = (size // BLOCK) ** 2 * len(positions)
+    stride = total // repeat
+    indices = np.arange(repeat)[:, None] * stride + np.arange(n)[None, :]
+    if key is not None:
+        indices = permute.Permutation(total, key)(indices.reshape(-1)).reshape(repeat, n)
+    return indices
+
+def working_plane(image, size):
+    # The luma resampled to size x size, with the resampling matrices
+    plane = luma(image)
+    rows = resample_matrix(plane.shape[0], size)
+    cols = resample_matrix(plane.shape[1], size)
+    return rows @ plane @ cols.T, rows, cols
+
+def plane_coefficients(plane, positions):
+    # (n_blocks * len(positions),) coefficients in slot order, and all block coefficients
+    coefficients = apply_dct_blocks(split_blocks(plane, BLOCK)[:, 0])
+    rows, cols = np.array(positions).T
+    return coefficients[:, rows, cols].reshape(-1), coefficients
+
+def embed_bits(image, bits, size=DEFAULT_SIZE, positions=LOW_BAND, step=DEFAULT_STEP, repeat=DEFAULT_REPEAT,
+               codeword=DEFAULT_CODEWORD, parity=DEFAULT_PARITY, key=None):
+    available = capacity(image, size, positions, repeat, codeword, parity)
+    if min(np.shape(image)[:2]) < size:
+        # An upsampled plane cannot be written back exactly: the payload would not read
+        raise ValueError(f"Cover of {np.shape(image)[1]}x{np.shape(image)[0]} is smaller than the "
+                         f"{size}x{size} working plane (lower size)")
+    if len(bits) > available:
+        raise ValueError(f"Secret needs {len(bits)} bits but the cover only holds {available}")
+    code = encode(bits, codeword, parity)
+    targets = slots(len(code), size, positions, repeat, key)
+
+    plane, rows, cols = working_plane(image, size)
+    values, coefficients = plane_coefficients(plane, positions)
+    values[targets] = quantize(values[targets], code[None, :], step)
+    block_rows, block_cols = np.array(positions).T
+    coefficients[:, block_rows, block_cols] = values.reshape(len(coefficients), -1)
+    marked = merge_blocks(plane, apply_idct_blocks(coefficients)[:, None], BLOCK)
+
+    # Least squares spread of the change: resampling the stego gives back the marked plane
+    delta = spread_matrix(rows) @ (marked - plane) @ spread_matrix(cols).T
+    stego = np.asarray(image, dtype=np.float64).copy()
+    if stego.ndim == 2:
+        stego += delta
+    else:
+        # The same change on R, G and B is a change of the luma alone (alpha is left as it is)
+        stego[..., :3 if stego.shape[2] >= 3 else 1] += delta[..., None]
+    return np.clip(np.round(stego), 0, 255).astype(np.uint8)
+
+def soft_values(stego_image, size=DEFAULT_SIZE, positions=LOW_BAND, step=DEFAULT_STEP, repeat=DEFAULT_REPEAT, key=None):
+    # Sum over the copies of every code bit of cos(2 pi c / step): > 0 for 0, < 0 for 1
+    n = code_capacity(size, positions, repeat)
+    values, _ = plane_coefficients(working_plane(stego_image, size)[0], positions)
+    return np.cos(2 * np.pi * values[slots(n, size, positions, repeat, key)] / step).sum(axis=0)
+
+def decode(soft, n, codeword=DEFAULT_CODEWORD, parity=DEFAULT_PARITY):
+    # First n payload bits from the soft code bits
+    k = codeword - parity
+    n_bytes = -(-n // 8)
+    count = -(-n_bytes // k)
+    if count * codeword * 8 > len(soft):
+        raise ValueError(f"Cannot read {n} bits from an image holding {len(soft) // (8 * codeword) * k * 8}")
+    soft = soft[:count * codeword * 8]
+    received = np.packbits(soft < 0).reshape(count, codeword)
+    reliability = np.abs(soft).reshape(count, codeword, 8).min(axis=2)
+    messages, failed = reedsolomon.decode(received, parity, reliability)
+    if failed:
+        raise ValueError(f"No readable payload: {failed} of {count} codewords beyond correction "
+                         "(image too damaged, or wrong options or key?)")
+    return np.unpackbits(messages.reshape(-1))[:n]
+
+def extract_bits(stego_image, n, size=DEFAULT_SIZE, positions=LOW_BAND, step=DEFAULT_STEP, repeat=DEFAULT_REPEAT,
+                 codeword=DEFAULT_CODEWORD, parity=DEFAULT_PARITY, key=None):
+    check_options(size, codeword, parity)
+    return decode(soft_values(stego_image, size, positions, step, repeat, key), n, codeword, parity)
+
+def embed(image, secret_data, size=DEFAULT_SIZE, positions=LOW_BAND, step=DEFAULT_STEP, repeat=DEFAULT_REPEAT,
+          codeword=DEFAULT_CODEWORD, parity=DEFAULT_PARITY, key=None):
+    return embed_bits(image, payload.from_secret(secret_data, 'ROBUST').bits, size, positions, step, repeat,
+                      codeword, parity, key)
+
+def extract(stego_image, size=DEFAULT_SIZE, positions=LOW_BAND, step=DEFAULT_STEP, repeat=DEFAULT_REPEAT,
+            codeword=DEFAULT_CODEWORD, parity=DEFAULT_PARITY, key=None):
+    # The soft values are computed once, then decoded as the frame is read
+    check_options(size, codeword, parity)
+    soft = soft_values(stego_image, size, positions, step, repeat, key)
+    return payload.read(lambda n: decode(soft, n, codeword, parity))
+
+if __name__ == '__main__':
+    import cv2
+    import matplotlib.pyplot as plt
+    from . import metrics
+    from .images import load_image
+
+    image = load_image('lena.png')
+    # The received image will be smaller than lena (512 x 512), so a smaller working plane
+    stego_image = embed(image, "TRY TO FIND ME", size=256)
+    print(f"PSNR: {metrics.psnr(image, stego_image)} dB")
+
+    # What a messaging app does to it: three quarters of the size, JPEG at quality 40
+    small = cv2.resize(stego_image, (image.shape[1] * 3 // 4, image.shape[0] * 3 // 4), interpolation=cv2.INTER_AREA)
+    _, jpeg = cv2.imencode('.jpg', small, [cv2.IMWRITE_JPEG_QUALITY, 40])
+    received = cv2.imdecode(jpeg, cv2.IMREAD_UNCHANGED)
+    print('Extracted after resize and JPEG:', extract(received, size=256).to_text())
+
+    fig, axs = plt.subplots(1, 2, figsize=(10, 5))
+    axs[0].imshow(stego_image, cmap='gray')
+    axs[0].set_title('Stego Image (secret is text) robust')
+    axs[1].imshow(received, cmap='gray')
+    axs[1].set_title('After resize and JPEG 40')
+    plt.show()
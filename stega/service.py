@@ -0,0 +1,413 @@
+import asyncio
+import ast
+import io
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from multiprocessing import shared_memory
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
+from . import Embedder, Extractor, get_module, planner, png
+from .images import load_image
+
+# HTTP service over the pixel methods, standard library only:
+#
+#   POST /embed?method=LSB&n_bits=2     multipart fields cover and secret (file) or text
+#   POST /extract?method=LSB            multipart field stego, or the image as the whole body
+#   POST /capacity?method=PVD           multipart field cover, or the image as the whole body
+#   GET  /metrics                       queue depth, batches and latencies as JSON
+#
+# Query parameters other than method are engine options (key=..., step=16).
+# Uploads are decoded in a thread straight into a shared memory block; the
+# workers read the pixels from there and write the stego image back in
+# place, so no image is pickled between processes. Small requests wait up
+# to batch_wait for others and go to a worker together, one pool round trip
+# per batch. The stego PNG is sent back with chunked transfer encoding as
+# png.iter_png produces it.
+
+METHODS = ('LSB', 'PVD', 'DCT', 'DHWT', 'ROBUST')
+ENDPOINTS = ('embed', 'extract', 'capacity', 'metrics')
+DEFAULT_PORT = 8080
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_BATCH_WAIT = 0.005
+# Requests on covers above this many pixels are dispatched on their own
+SMALL_PIXELS = 512 * 512
+MAX_BODY = 64 * 1024 * 1024
+MAX_HEADER = 64 * 1024
+LATENCY_WINDOW = 1024
+
+class HTTPError(Exception):
+    # close: the rest of the connection cannot be read (body length unknown)
+    def __init__(self, status, message, close=False):
+        super().__init__(message)
+        self.status = status
+        self.close = close
+
+def parse_value(text):
+    # Option values are read as Python literals when possible (n_bits=2, step=16.0)
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def parse_multipart(body, content_type):
+    # {field name: bytes} of a multipart/form-data body
+    boundary = None
+    for parameter in content_type.split(';')[1:]:
+        name, _, value = parameter.strip().partition('=')
+        if name.lower() == 'boundary':
+            boundary = value.strip('"').encode('latin-1')
+    if not boundary:
+        raise HTTPError(400, "multipart body without boundary")
+    fields = {}
+    for part in body.split(b'--' + boundary)[1:]:
+        if part.startswith(b'--'):
+            break
+        head, separator, content = part.partition(b'\r\n\r\n')
+        if not separator:
+            raise HTTPError(400, "malformed multipart body")
+        name = None
+        for line in head.decode('latin-1').split('\r\n'):
+            if line.lower().startswith('content-disposition:'):
+                for parameter in line.split(';')[1:]:
+                    key, _, value = parameter.strip().partition('=')
+                    if key == 'name':
+                        name = value.strip('"')
+        if name is not None:
+            # The part ends with the CRLF in front of the next boundary
+            fields[name] = content[:-2] if content.endswith(b'\r\n') else content
+    return fields
+
+def decode_upload(data):
+    # Pixels of an uploaded image file in a new shared memory block (runs in a thread)
+    try:
+        image = load_image(io.BytesIO(data))
+    except Exception as e:
+        raise HTTPError(400, f"cannot decode image ({type(e).__name__})") from None
+    block = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+    np.ndarray(image.shape, image.dtype, buffer=block.buf)[...] = image
+    return block, image.shape, image.dtype.str
+
+def run_job(action, method, options, name, shape, dtype, secret):
+    block = shared_memory.SharedMemory(name=name)
+    image = np.ndarray(shape, dtype, buffer=block.buf)
+    try:
+        if action == 'capacity':
+            return {'status': 'ok', 'capacity': int(Embedder(method, **options).capacity(image))}
+        if action == 'embed':
+            # Same shape and dtype as the cover: written back in place for the server to encode
+            image[...] = Embedder(method, **options).embed(image, secret)
+            return {'status': 'ok'}
+        bitstream = Extractor(method, **options).extract(image)
+        return {'status': 'ok', 'data': bitstream.to_bytes(), 'kind': bitstream.kind, 'shape': bitstream.shape}
+    except ValueError as e:
+        return {'status': 'error', 'code': 400, 'error': str(e)}
+    except Exception as e:
+        return {'status': 'error', 'code': 500, 'error': f'{type(e).__name__}: {e}'}
+    finally:
+        del image
+        block.close()
+
+def run_jobs(jobs):
+    # Runs in a worker process: one result per job of a batch
+    return [run_job(*job) for job in jobs]
+
+class Latencies:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.recent.append(seconds)
+
+    def summary(self):
+        # Over the last window requests, in milliseconds
+        if not self.recent:
+            return {'count': self.count}
+        ms = np.array(self.recent) * 1000
+        return {'count': self.count, 'mean_ms': round(float(ms.mean()), 3), 'p50_ms': round(float(np.percentile(ms, 50)), 3),
+                'p95_ms': round(float(np.percentile(ms, 95)), 3), 'max_ms': round(float(ms.max()), 3)}
+
+class Batcher:
+    # Collects jobs into batches and runs them in the pool, at most
+    # max_batches at a time; jobs wait in the queue meanwhile.
+
+    def __init__(self, pool, batch_size, batch_wait, max_batches):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.slots = asyncio.Semaphore(max_batches)
+        self.queue = asyncio.Queue()
+        self.collecting = 0
+        self.held = None
+        self.in_flight = 0
+        self.batches = 0
+        self.jobs = 0
+        self.queue_wait = Latencies()
+
+    async def submit(self, job, pixels):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((job, pixels, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            if self.held is not None:
+                batch, self.held = [self.held], None
+            else:
+                batch = [await self.queue.get()]
+            self.collecting = 1
+            # Small jobs: wait a little for others to share the round trip
+            deadline = loop.time() + self.batch_wait
+            while batch[0][1] <= SMALL_PIXELS and len(batch) < self.batch_size:
+                if self.queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                if item[1] > SMALL_PIXELS:
+                    # Large job: on its own, in the next batch
+                    self.held = item
+                    break
+                batch.append(item)
+                self.collecting = len(batch)
+            self.collecting = 0
+            asyncio.create_task(self.dispatch(batch))
+
+    async def dispatch(self, batch):
+        now = time.perf_counter()
+        for item in batch:
+            self.queue_wait.add(now - item[3])
+        self.batches += 1
+        self.jobs += len(batch)
+        self.in_flight += len(batch)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.pool, run_jobs, [item[0] for item in batch])
+        except Exception as e:
+            results = [{'status': 'error', 'code': 500, 'error': f'{type(e).__name__}: {e}'}] * len(batch)
+        finally:
+            self.in_flight -= len(batch)
+            self.slots.release()
+        for item, result in zip(batch, results):
+            if not item[2].done():
+                item[2].set_result(result)
+
+    @property
+    def depth(self):
+        return self.queue.qsize() + self.collecting + (self.held is not None)
+
+class Service:
+    def __init__(self, workers=None, batch_size=DEFAULT_BATCH_SIZE, batch_wait=DEFAULT_BATCH_WAIT, max_body=MAX_BODY):
+        self.workers = workers or multiprocessing.cpu_count()
+        # spawn: forking a process that already runs threads and an event loop is not safe
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.batcher = Batcher(self.pool, batch_size, batch_wait, 2 * self.workers)
+        self.max_body = max_body
+        self.latencies = {}
+        self.statuses = {}
+        self.started = time.time()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        try:
+            while await self.handle_request(reader, writer):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer):
+        # Returns whether the connection stays open for another request
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return False
+        except asyncio.LimitOverrunError:
+            await self.send_error(writer, 431, "request header too large", close=True)
+            return False
+        start = time.perf_counter()
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            verb, target, version = lines[0].split(' ')
+        except ValueError:
+            await self.send_error(writer, 400, "malformed request line", close=True)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+        url = urlsplit(target)
+        endpoint = url.path.strip('/')
+        try:
+            body = await self.read_body(reader, headers)
+            status = await self.route(writer, verb, endpoint, dict(parse_qsl(url.query)), headers, body, keep_alive)
+        except HTTPError as e:
+            status = e.status
+            keep_alive = keep_alive and not e.close and status not in (411, 413)
+            await self.send_error(writer, status, str(e), close=not keep_alive)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            raise
+        except Exception as e:
+            status = 500
+            keep_alive = False
+            await self.send_error(writer, status, f'{type(e).__name__}: {e}', close=True)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if endpoint not in ENDPOINTS:
+            endpoint = 'other'
+        self.latencies.setdefault(endpoint, Latencies()).add(time.perf_counter() - start)
+        return keep_alive
+
+    async def read_body(self, reader, headers):
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "chunked request bodies are not supported, send Content-Length")
+        text = headers.get('content-length', '0')
+        if not (text.isascii() and text.isdigit()):
+            raise HTTPError(400, f"Content-Length must be a byte count, got {text!r}", close=True)
+        length = int(text)
+        if length > self.max_body:
+            raise HTTPError(413, f"body of {length} bytes, the limit is {self.max_body}")
+        return await reader.readexactly(length) if length else b''
+
+    async def route(self, writer, verb, endpoint, query, headers, body, keep_alive):
+        if endpoint == 'metrics':
+            if verb != 'GET':
+                raise HTTPError(405, "use GET")
+            await self.send(writer, 200, json.dumps(self.metrics()).encode(), 'application/json', close=not keep_alive)
+            return 200
+        if endpoint not in ENDPOINTS[:3]:
+            raise HTTPError(404, f"no endpoint /{endpoint}")
+        if verb != 'POST':
+            raise HTTPError(405, "use POST")
+
+        method = query.pop('method', '').upper()
+        if method not in METHODS:
+            raise HTTPError(400, f"method must be one of {', '.join(METHODS)}")
+        options = {name: parse_value(value) for name, value in query.items()}
+        try:
+            planner.check_options(get_module(method), options)
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+        content_type = headers.get('content-type', '')
+        if content_type.lower().startswith('multipart/form-data'):
+            fields = parse_multipart(body, content_type)
+        else:
+            fields = {'stego' if endpoint == 'extract' else 'cover': body}
+        image_field = 'stego' if endpoint == 'extract' else 'cover'
+        if not fields.get(image_field):
+            raise HTTPError(400, f"missing {image_field} image")
+        secret = None
+        if endpoint == 'embed':
+            if 'text' in fields:
+                try:
+                    secret = fields['text'].decode('utf-8')
+                except UnicodeDecodeError:
+                    raise HTTPError(400, "text field is not UTF-8, send binary secrets as the secret field") from None
+            elif 'secret' in fields:
+                secret = fields['secret']
+            else:
+                raise HTTPError(400, "missing secret or text field")
+
+        loop = asyncio.get_running_loop()
+        upload = fields.pop(image_field)
+        block, shape, dtype = await loop.run_in_executor(None, decode_upload, upload)
+        try:
+            pixels = int(np.prod(shape[:2]))
+            result = await self.batcher.submit((endpoint, method, options, block.name, shape, dtype, secret), pixels)
+            if result['status'] != 'ok':
+                raise HTTPError(result['code'], result['error'])
+            close = not keep_alive
+            if endpoint == 'capacity':
+                answer = {'method': method, 'capacity': result['capacity'], 'bytes': result['capacity'] // 8}
+                await self.send(writer, 200, json.dumps(answer).encode(), 'application/json', close=close)
+            elif endpoint == 'extract':
+                extra = {'X-Stega-Kind': result['kind']}
+                if result['shape']:
+                    extra['X-Stega-Shape'] = ','.join(map(str, result['shape']))
+                content = 'text/plain; charset=utf-8' if result['kind'] == 'text' else 'application/octet-stream'
+                await self.send(writer, 200, result['data'], content, extra, close=close)
+            else:
+                # Ancillary chunks of a PNG cover (colour profile, resolution, text) are kept
+                pieces = png.iter_png(np.ndarray(shape, dtype, buffer=block.buf), chunks=png.ancillary_chunks(upload))
+                try:
+                    await self.stream(writer, pieces, 'image/png', close=close)
+                finally:
+                    # Drops the writer's view of the block before the block is closed
+                    pieces.close()
+            return 200
+        finally:
+            block.close()
+            block.unlink()
+
+    def metrics(self):
+        batcher = self.batcher
+        return {
+            'workers': self.workers,
+            'uptime_s': round(time.time() - self.started, 3),
+            'queue_depth': batcher.depth,
+            'in_flight': batcher.in_flight,
+            'batches': batcher.batches,
+            'jobs': batcher.jobs,
+            'mean_batch_size': round(batcher.jobs / batcher.batches, 3) if batcher.batches else 0.0,
+            'queue_wait': batcher.queue_wait.summary(),
+            'latency': {endpoint: latencies.summary() for endpoint, latencies in self.latencies.items()},
+            'responses': {str(status): count for status, count in sorted(self.statuses.items())},
+        }
+
+    async def send(self, writer, status, body, content_type, headers=None, close=False):
+        head = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}', f'Content-Type: {content_type}',
+                f'Content-Length: {len(body)}']
+        head += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        if close:
+            head.append('Connection: close')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        writer.write(body)
+        await writer.drain()
+
+    async def send_error(self, writer, status, message, close=False):
+        await self.send(writer, status, json.dumps({'error': message}).encode(), 'application/json', close=close)
+
+    async def stream(self, writer, pieces, content_type, close=False):
+        # Chunked transfer encoding, one chunk per piece of the iterator (produced
+        # in a thread), waiting for the socket to drain between chunks
+        loop = asyncio.get_running_loop()
+        head = ['HTTP/1.1 200 OK', f'Content-Type: {content_type}', 'Transfer-Encoding: chunked']
+        if close:
+            head.append('Connection: close')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        while True:
+            piece = await loop.run_in_executor(None, next, pieces, None)
+            if piece is None:
+                break
+            writer.write(b'%x\r\n' % len(piece))
+            writer.write(piece)
+            writer.write(b'\r\n')
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, **options):
+    asyncio.run(Service(**options).serve(host, port))
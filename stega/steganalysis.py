@@ -0,0 +1,267 @@
+import math
+from functools import lru_cache
+import numpy as np
+from .pvd import RANGE_LOWER, RANGE_WIDTH
+
+# Detection side: estimates of the share of pixels (LSB) or pixel pairs (PVD)
+# carrying a payload, from the image alone. All tests work on whole
+# grayscale images (a colour image is tested as its channels, each row of a
+# channel a row of its own; alpha is left out) with histograms of pixel
+# values and of horizontal pixel pairs.
+#
+#   chi_square    Westfeld-Pfitzmann pairs of values test. Only sees
+#                 sequential embedding (payload at the top of the image).
+#   rs_analysis   Fridrich RS analysis, regular/singular groups of 4 pixels.
+#   sample_pairs  Dumitrescu-Wu-Wang sample pair analysis.
+#   pvd_analysis  Step of the pixel difference histogram at the Wu-Tsai
+#                 range boundaries.
+#
+# Reproduce the numbers below with python -m stega.bench --steganalysis
+# (--covers for other images). On lena, baboon and the 14 scikit-image
+# sample photographs, with keyed LSB at 5 % and PVD at 10 % of capacity:
+#   - clean covers read 0.00-0.03, except textures and astronomy (grass.png
+#     0.07, hubble_deep_field.jpg 0.08), which are flagged at the default
+#     threshold;
+#   - the LSB estimate is the payload share -0.01 to +0.03 (more on the
+#     covers above), so a 5 % payload sits at the 0.05 threshold (lena
+#     0.047, coins 0.041); 6 % is found on every cover. PVD at 10 % reads
+#     0.07-0.13.
+# Estimates are meaningless on synthetic graphics. On images with every
+# other value missing from their histogram (contrast stretched, baboon.png)
+# RS and SPA read 0.4-1.0 on clean images and the LSB estimate is the one
+# of lsb_ceiling.
+# Speed on one core (bench default, 4096x4096): about 550 MP/s for
+# chi_square, 270 for rs_analysis, 360 for sample_pairs, 740 for
+# pvd_analysis, 85 for all tests through analyze.
+
+DEFAULT_THRESHOLD = 0.05
+ALL_TESTS = ('chi_square', 'rs', 'spa', 'pvd')
+
+# Every pixel pair as one uint16 code, left | right << 8 (LEFT, RIGHT):
+# the tests are table lookups and histograms of these codes
+CODES = np.arange(1 << 16)
+LEFT, RIGHT = CODES & 0xFF, CODES >> 8
+# Groups of rows per block of work, so temporaries stay in cache
+BLOCK_PIXELS = 1 << 20
+
+def as_plane(image):
+    # The image as one uint8 plane: a colour image with every channel row as
+    # a row of its own, alpha left out (a constant or mask channel has no
+    # natural LSB statistics)
+    image = np.asarray(image)
+    if image.dtype != np.uint8:
+        raise ValueError("Steganalysis works on uint8 images")
+    if image.ndim == 3:
+        if image.shape[2] in (2, 4):
+            image = image[..., :-1]
+        image = image.transpose(0, 2, 1).reshape(-1, image.shape[1])
+    return np.ascontiguousarray(image)
+
+def pair_codes(plane, offset):
+    # Codes of the pixel pairs (2j + offset, 2j + offset + 1) of every row: a uint16 view, no copy
+    width = (plane.shape[1] - offset) // 2 * 2
+    return plane[:, offset:offset + width].view('<u2')
+
+def row_blocks(plane):
+    step = max(BLOCK_PIXELS // max(plane.shape[1], 1), 1)
+    for start in range(0, plane.shape[0], step):
+        yield plane[start:start + step]
+
+def pair_histogram(plane, offset):
+    # Counts of the 65536 pair codes
+    counts = np.zeros(1 << 16, dtype=np.int64)
+    for rows in row_blocks(plane):
+        counts += np.bincount(pair_codes(rows, offset).reshape(-1), minlength=1 << 16)
+    return counts
+
+def value_histogram(flat):
+    # Histogram of a flat uint8 array, two pixels per bincount entry
+    counts = np.bincount(flat[:flat.size // 2 * 2].view('<u2'), minlength=1 << 16).reshape(256, 256)
+    histogram = counts.sum(axis=0) + counts.sum(axis=1)
+    if flat.size % 2:
+        histogram[flat[-1]] += 1
+    return histogram
+
+def chi2_survival(statistic, df):
+    # P(chi2(df) >= statistic) with the Wilson-Hilferty normal approximation
+    if df <= 0:
+        return 0.0
+    scale = 2 / (9 * df)
+    z = ((statistic / df) ** (1 / 3) - (1 - scale)) / math.sqrt(scale)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def pairs_of_values_p(histogram):
+    # Probability that the histogram has the equalized pairs of values (2i, 2i + 1) of LSB embedding
+    even = histogram[0::2].astype(np.float64)
+    odd = histogram[1::2].astype(np.float64)
+    expected = (even + odd) / 2
+    used = expected > 4
+    statistic = float((((even - expected) ** 2)[used] / expected[used]).sum())
+    return chi2_survival(statistic, int(used.sum()) - 1)
+
+def chi_square(image, slices=100):
+    # Share of the image (in raster order) over which the p-value of the
+    # growing prefix stays above 0.5, and the p-value of the whole image
+    flat = as_plane(image).reshape(-1)
+    slices = max(min(slices, flat.size), 1)
+    bounds = np.arange(slices + 1) * flat.size // slices
+    histograms = np.array([value_histogram(flat[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]).cumsum(axis=0)
+    p_values = np.array([pairs_of_values_p(h) for h in histograms])
+    embedded = np.flatnonzero(p_values <= 0.5)
+    rate = (embedded[0] if len(embedded) else slices) / slices
+    return {'rate': float(rate), 'p_value': float(p_values[-1])}
+
+def smaller_root(a, b, c):
+    # Root of a x^2 + b x + c closest to 0 (real part when complex)
+    if abs(a) < 1e-12:
+        return -c / b if b else 0.0
+    discriminant = max(b * b - 4 * a * c, 0.0)
+    roots = ((-b + math.sqrt(discriminant)) / (2 * a), (-b - math.sqrt(discriminant)) / (2 * a))
+    return min(roots, key=abs)
+
+def flip_change(x, negative):
+    # x + flip_change(x) is F1(x) (2i <-> 2i + 1) or, negative, F-1(x) (2i - 1 <-> 2i)
+    odd = x & 1
+    return 2 * odd - 1 if negative else 1 - 2 * odd
+
+@lru_cache(maxsize=None)
+def rs_tables():
+    # RS groups are 4 horizontal pixels (g0, g1, g2, g3), mask [0, 1, 1, 0],
+    # smoothness the sum of |neighbour differences|. Flipping changes it by
+    # a term per neighbour pair: tables of those terms for the codes of
+    # (g0, g1), (g1, g2) and (g2, g3). Four variants, each a 4 bit field
+    # biased so the sum of the three terms is 0..8 (4 = unchanged):
+    # F1 and F-1 on the image, F1 and F-1 on the image with all LSBs flipped.
+    tables = [np.zeros(1 << 16, dtype=np.uint16) for _ in range(3)]
+    for variant, (negative, flipped) in enumerate(((False, False), (True, False), (False, True), (True, True))):
+        a, b = (LEFT ^ 1, RIGHT ^ 1) if flipped else (LEFT, RIGHT)
+        change_a, change_b = flip_change(a, negative), flip_change(b, negative)
+        base = np.abs(b - a)
+        terms = (np.abs(b + change_b - a) - base + 1,
+                 np.abs(b + change_b - a - change_a) - base + 2,
+                 np.abs(b - a - change_a) - base + 1)
+        for table, term in zip(tables, terms):
+            table += (term << (4 * variant)).astype(np.uint16)
+    return tables
+
+def rs_differences(plane):
+    # R - S as shares of the groups, for the four variants of rs_tables
+    groups = plane.shape[1] // 4
+    if groups == 0 or plane.shape[0] == 0:
+        return None
+    first, middle, last = rs_tables()
+    counts = np.zeros(1 << 16, dtype=np.int64)
+    for rows in row_blocks(plane):
+        outer = pair_codes(rows, 0)
+        change = first[outer[:, 0:2 * groups:2]] + middle[pair_codes(rows, 1)[:, 0:2 * groups:2]] + last[outer[:, 1:2 * groups:2]]
+        counts += np.bincount(change.reshape(-1), minlength=1 << 16)
+    counts = counts.reshape(16, 16, 16, 16)
+    result = []
+    for variant in range(4):
+        # Axis 3 is the lowest field
+        field = counts.sum(axis=tuple(axis for axis in range(4) if axis != 3 - variant))
+        result.append(float(field[5:].sum() - field[:4].sum()) / (groups * plane.shape[0]))
+    return result
+
+def rs_rate(d0, dn0, d1, dn1):
+    a, b, c = 2 * (d1 + d0), dn0 - dn1 - d1 - 3 * d0, d0 - dn0
+    if b * b - 4 * a * c < 0:
+        # No real root: R_M and S_M have met, which only happens close to full embedding
+        return 1.0
+    x = smaller_root(a, b, c)
+    rate = x / (x - 0.5) if x != 0.5 else 1.0
+    # A root between 0 and 1/2 far from 0 has crossed the pole of x / (x - 1/2): full embedding too
+    return float(np.clip(1.0 if rate < -0.5 else rate, 0, 1))
+
+def rs_analysis(image):
+    differences = rs_differences(as_plane(image))
+    return {'rate': rs_rate(*differences) if differences else 0.0}
+
+# Sample pairs are horizontally adjacent pixels (u, v). X: v even and u < v,
+# or v odd and u > v. Z: u == v. W: u and v differ in their LSB only. Y: the rest.
+SPA_X = (LEFT < RIGHT) ^ ((RIGHT & 1 == 1) & (LEFT != RIGHT))
+SPA_Z = LEFT == RIGHT
+SPA_W = (LEFT ^ RIGHT) == 1
+
+def spa_rate(histogram):
+    # From the histogram of the codes of all adjacent pairs
+    total = int(histogram.sum())
+    if total == 0:
+        return 0.0
+    x, z, w = (int(histogram[mask].sum()) for mask in (SPA_X, SPA_Z, SPA_W))
+    y = total - x - z
+    return float(np.clip(smaller_root((w + z) / 2, 2 * x - total, y - x), 0, 1))
+
+def sample_pairs(image):
+    plane = as_plane(image)
+    return {'rate': spa_rate(pair_histogram(plane, 0) + pair_histogram(plane, 1))}
+
+def lsb_ceiling(histogram):
+    # Highest LSB embedding rate the histogram allows: embedding at rate p
+    # leaves at least p / 2 of every pair of values (2i, 2i + 1) in each value
+    pairs = histogram.reshape(-1, 2)
+    total = pairs.sum()
+    return float(2 * pairs.min(axis=1).sum() / total) if total else 0.0
+
+# |difference| of every pair code
+PAIR_DIFFERENCE = np.abs(LEFT - RIGHT)
+
+def boundary_step(h, scale):
+    # PVD spreads the |difference| of used pairs evenly over their range and
+    # never moves a pair out of it, so range totals are kept and a step
+    # appears at every range boundary b:
+    #   h(b - 1) - h(b) = p * (T_k / w_k - T_k+1 / w_k+1) + (1 - p) * natural slope
+    # The natural slope (times 1 - p) is read next to the boundary, inside
+    # each range. h has bins of scale differences.
+    step = spread = 0.0
+    for k in range(3):
+        lower, b = int(RANGE_LOWER[k]) // scale, int(RANGE_LOWER[k + 1]) // scale
+        width, next_width = int(RANGE_WIDTH[k]) // scale, int(RANGE_WIDTH[k + 1]) // scale
+        left = h[lower:b].sum() / width
+        right = h[b:b + next_width].sum() / next_width
+        slope = (h[b - 3] - h[b - 1] + h[b] - h[b + 2]) / 4 if scale == 1 else (h[b - 2] - h[b - 1] + h[b] - h[b + 1]) / 2
+        step += h[b - 1] - h[b] - slope
+        spread += left - right
+    return float(np.clip(step / spread, 0, 1)) if spread > 0 else 0.0
+
+def pvd_rate(histogram):
+    # From the histogram of the codes of the PVD pairs. The step is read on
+    # single differences and on pairs of differences (2i, 2i + 1): the
+    # second also works on covers with every other value missing
+    # (contrast stretched), whose odd differences are all but empty.
+    h = np.bincount(PAIR_DIFFERENCE, weights=histogram, minlength=256)
+    return max(boundary_step(h, 1), boundary_step(h[0::2] + h[1::2], 2))
+
+def pvd_analysis(image):
+    return {'rate': pvd_rate(pair_histogram(as_plane(image), 0))}
+
+def analyze(image, tests=ALL_TESTS, threshold=DEFAULT_THRESHOLD):
+    # Estimated embedding rate of every test, and the verdict: rate is the
+    # highest of the LSB (mean of RS and SPA, capped by the histogram) and
+    # PVD estimates
+    plane = as_plane(image)
+    result = {}
+    if 'chi_square' in tests:
+        chi = chi_square(plane)
+        result['chi_square_rate'] = chi['rate']
+        result['chi_square_p'] = chi['p_value']
+    # Pairs (2j, 2j + 1) are the PVD pairs and half of the sample pairs
+    even = pair_histogram(plane, 0) if 'spa' in tests or 'pvd' in tests else None
+    lsb = []
+    if 'rs' in tests:
+        differences = rs_differences(plane)
+        result['rs_rate'] = rs_rate(*differences) if differences else 0.0
+        lsb.append(result['rs_rate'])
+    if 'spa' in tests:
+        result['spa_rate'] = spa_rate(even + pair_histogram(plane, 1))
+        lsb.append(result['spa_rate'])
+    rates = []
+    if lsb:
+        result['lsb_rate'] = min(float(np.mean(lsb)), lsb_ceiling(value_histogram(plane.reshape(-1))))
+        rates.append(result['lsb_rate'])
+    if 'pvd' in tests:
+        result['pvd_rate'] = pvd_rate(even)
+        rates.append(result['pvd_rate'])
+    result['rate'] = max(rates, default=0.0)
+    result['suspicious'] = result['rate'] > threshold
+    return result
@@ -0,0 +1,209 @@
+import numpy as np
+from . import get_module, matrix as hamming, payload, planner
+
+# Strip by strip embedding for covers too large to hold in memory. The cover
+# is a .npy or raw pixel file (or any array) processed in strips of whole
+# rows; each strip is mapped, embedded and written to the output before the
+# next one is touched, so memory stays around the tile budget.
+#
+# PNG, TIFF and other compressed covers are not read by strips: they are
+# decoded whole (images.load_image) and then an in memory array, which only
+# bounds the working memory of the engines. Convert them to .npy once for
+# bounded memory.
+#
+# Payload bits go to the strips in order, each strip taking as many as its
+# capacity allows. For every method this is the same bit-to-pixel mapping as
+# embedding the whole image at once, with two exceptions that need the same
+# tile size to extract:
+#   - with a key, positions are scattered inside each strip;
+#   - LSB matrix embedding uses one Hamming code (k chosen for the whole
+#     payload, written in the first strip) but a strip only holds whole
+#     groups of 2^k - 1 LSBs.
+
+DEFAULT_TILE_BYTES = 64 * 1024 * 1024
+# Cover files open_image refuses instead of reading their bytes as pixels
+COMPRESSED_EXTENSIONS = ('.png', '.tif', '.tiff', '.jpg', '.jpeg', '.bmp', '.webp')
+
+class RasterFile:
+    # Pixel rows of an image file on disk (.npy or raw). Only the strip being
+    # read or written is mapped, and it is unmapped right after, so mapped
+    # pages never add up to the whole file.
+
+    def __init__(self, path, shape, dtype=np.uint8, offset=0):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.offset = offset
+        self.row_bytes = int(np.prod(self.shape[1:], dtype=np.int64)) * self.dtype.itemsize
+
+    def _map(self, start, end, mode):
+        return np.memmap(self.path, dtype=self.dtype, mode=mode, offset=self.offset + start * self.row_bytes,
+                         shape=(end - start,) + self.shape[1:])
+
+    def read(self, start, end):
+        rows = self._map(start, end, 'r')
+        data = np.array(rows)
+        del rows
+        return data
+
+    def write(self, start, data):
+        rows = self._map(start, start + len(data), 'r+')
+        rows[:] = data
+        rows.flush()
+        del rows
+
+def open_image(path, shape=None, dtype=np.uint8):
+    # .npy files carry their shape; raw pixel files need it
+    if path.lower().endswith(COMPRESSED_EXTENSIONS):
+        raise ValueError(f"{path} is compressed and cannot be read by strips, convert it to .npy")
+    if path.endswith('.npy'):
+        with open(path, 'rb') as f:
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if fortran_order:
+                raise ValueError("Fortran ordered .npy files cannot be read by rows")
+            return RasterFile(path, shape, dtype, f.tell())
+    if shape is None:
+        raise ValueError("shape is required for raw pixel files")
+    return RasterFile(path, shape, dtype)
+
+def create_image(path, shape, dtype=np.uint8):
+    # The file is created at full size without touching its pages
+    if path.endswith('.npy'):
+        np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+        return open_image(path)
+    with open(path, 'wb') as f:
+        f.truncate(int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+    return RasterFile(path, shape, dtype)
+
+def read_rows(image, start, end):
+    if isinstance(image, RasterFile):
+        return image.read(start, end)
+    return np.array(image[start:end])
+
+def write_rows(image, start, data):
+    if isinstance(image, RasterFile):
+        image.write(start, data)
+    else:
+        image[start:start + len(data)] = data
+
+def strip_rows(image, tile_bytes, alignment):
+    # Rows per strip: as many as fit the budget, rounded down to the method's alignment
+    row_bytes = max(int(np.prod(image.shape[1:], dtype=np.int64)) * np.dtype(image.dtype).itemsize, 1)
+    return max(tile_bytes // row_bytes // alignment, 1) * alignment
+
+def strips(image, tile_bytes, alignment):
+    rows = strip_rows(image, tile_bytes, alignment)
+    for start in range(0, image.shape[0], rows):
+        yield start, min(start + rows, image.shape[0])
+
+def is_matrix(method, options):
+    return method.upper() == 'LSB' and bool(options.get('matrix'))
+
+def matrix_strip_bits(size, k, first):
+    # Payload bits a strip of size LSBs holds in whole groups (the first one also holds the preamble)
+    return max(size - (hamming.K_BITS if first else 0), 0) // ((1 << k) - 1) * k
+
+def matrix_k(image, tile_bytes, n):
+    # Largest k whose groups, strip by strip, hold the payload (as choose_k for a whole image)
+    row_size = int(np.prod(image.shape[1:], dtype=np.int64))
+    sizes = [(end - start) * row_size for start, end in strips(image, tile_bytes, 1)]
+    for k in range(hamming.MAX_K, 0, -1):
+        available = sum(matrix_strip_bits(size, k, i == 0) for i, size in enumerate(sizes))
+        if available >= n:
+            return k
+    raise ValueError(f"Secret needs {n} bits but the cover only holds {available}")
+
+def embed(cover, secret_data, output, method='LSB', tile_bytes=DEFAULT_TILE_BYTES, progress=None, **options):
+    # cover and output are RasterFile objects or arrays of the same shape
+    module = get_module(method)
+    planner.check_options(module, options)
+    bits = payload.from_secret(secret_data, method).bits
+    alignment = planner.call(module.row_alignment, **options)
+    matrix = is_matrix(method, options)
+    if matrix:
+        module.check_options(options.get('n_bits', 1), True)
+        k = matrix_k(cover, tile_bytes, len(bits))
+    position = 0
+    for index, (start, end) in enumerate(strips(cover, tile_bytes, alignment)):
+        strip = read_rows(cover, start, end)
+        if position < len(bits) and matrix:
+            take = min(matrix_strip_bits(strip.size, k, index == 0), len(bits) - position)
+            if take:
+                strip = module.embed_matrix(np.array(strip, dtype=np.uint8), bits[position:position + take],
+                                            options.get('key'), k, index == 0)
+            position += take
+        elif position < len(bits):
+            analysis = planner.run_analysis(module, strip, options)
+            take = min(analysis['capacity'], len(bits) - position)
+            strip = planner.call(module.embed_bits, strip, bits[position:position + take], **planner.engine_options(module, options, analysis))
+            position += take
+        write_rows(output, start, strip)
+        if progress:
+            progress(end, cover.shape[0])
+    if position < len(bits):
+        raise ValueError(f"Secret needs {len(bits)} bits but the cover only holds {position}")
+    return len(bits)
+
+class StripReader:
+    # read_bits(n) for payload.read: extracts strips lazily and keeps the bits read so far
+
+    def __init__(self, stego, module, tile_bytes, options, progress=None, matrix=False):
+        self.stego = stego
+        self.module = module
+        self.options = options
+        self.progress = progress
+        self.matrix = matrix
+        # Hamming code of matrix embedding, read from the first strip
+        self.k = None
+        planner.check_options(module, options)
+        self.strips = strips(stego, tile_bytes, planner.call(module.row_alignment, **options))
+        self.chunks = []
+        self.available = 0
+
+    def __call__(self, n):
+        while self.available < n:
+            try:
+                start, end = next(self.strips)
+            except StopIteration:
+                raise ValueError(f"Cannot read {n} bits from an image holding {self.available}") from None
+            # Whole strips are read: the header and the body usually come from the same one
+            strip = read_rows(self.stego, start, end)
+            if self.matrix:
+                chunk = self._matrix_chunk(strip)
+            else:
+                analysis = planner.run_analysis(self.module, strip, self.options)
+                chunk = planner.call(self.module.extract_bits, strip, analysis['capacity'],
+                                     **planner.engine_options(self.module, self.options, analysis))
+            # Can be less than the capacity: a strip partly filled with LSB matrix embedding holds fewer bits
+            self.chunks.append(chunk)
+            self.available += len(chunk)
+            if self.progress:
+                self.progress(end, self.stego.shape[0])
+        bits = np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.uint8)
+        self.chunks = [bits]
+        return bits[:n]
+
+    def _matrix_chunk(self, strip):
+        flat = np.asarray(strip, dtype=np.uint8).reshape(-1)
+        key = self.options.get('key')
+        if self.k is None:
+            if flat.size < hamming.K_BITS:
+                raise ValueError("No embedded payload found (wrong method, options or key?)")
+            self.k = hamming.read_k(self.module.samples(flat, key, hamming.K_BITS) & 1)
+            return self.module.extract_matrix(flat, matrix_strip_bits(flat.size, self.k, True), key)
+        return self.module.extract_matrix(flat, matrix_strip_bits(flat.size, self.k, False), key, self.k)
+
+def extract(stego, method='LSB', tile_bytes=DEFAULT_TILE_BYTES, progress=None, **options):
+    # Stops reading strips as soon as the payload is complete
+    return payload.read(StripReader(stego, get_module(method), tile_bytes, options, progress, is_matrix(method, options)))
+
+def embed_file(cover_path, secret_data, output_path, method='LSB', tile_bytes=DEFAULT_TILE_BYTES, shape=None, **options):
+    cover = open_image(cover_path, shape)
+    output = create_image(output_path, cover.shape, cover.dtype)
+    return embed(cover, secret_data, output, method, tile_bytes, **options)
+
+def extract_file(stego_path, method='LSB', tile_bytes=DEFAULT_TILE_BYTES, shape=None, **options):
+    return extract(open_image(stego_path, shape), method, tile_bytes, **options)
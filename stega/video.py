@@ -0,0 +1,212 @@
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from . import get_module, payload, planner
+
+# Hiding a secret in the frames of a lossless video (FFV1 or PNG codec,
+# through OpenCV). Frames are decoded one at a time, embedded by the image
+# engines in a pool of worker processes and written back in order. Only the
+# window of frames in flight is held in memory.
+#
+# The payload is cut into one chunk per frame. Each chunk is preceded by a
+# header giving its bit offset in the payload, its length, the payload length
+# and a CRC32, so every frame can be read on its own. Each frame is offered
+# as many bits as the first frame holds. A frame that holds fewer (PVD and
+# DCT capacity depends on the content) hands the rest back, and the next
+# frame submitted takes it. Chunks are therefore not always in frame order;
+# the extractor puts them back by offset and stops reading once the payload
+# is complete.
+#
+# Only the video stream is written: audio and subtitles are not copied.
+# A lossy codec would destroy the payload.
+
+MAGIC = b'SV'
+# Magic, bit offset, chunk length, payload length, CRC32 of the other fields and the chunk
+HEADER = struct.Struct('>2sIIII')
+HEADER_BITS = HEADER.size * 8
+CODECS = {'FFV1': 'FFV1', 'PNG': 'png '}
+DEFAULT_CODEC = 'FFV1'
+
+def chunk_crc(offset, total, chunk):
+    return zlib.crc32(np.packbits(chunk).tobytes(), zlib.crc32(struct.pack('>III', offset, len(chunk), total)))
+
+def frame_header(offset, total, chunk):
+    header = HEADER.pack(MAGIC, offset, len(chunk), total, chunk_crc(offset, total, chunk))
+    return np.unpackbits(np.frombuffer(header, dtype=np.uint8))
+
+def read_frames(path):
+    # RGB frames of a video (OpenCV decodes to BGR; DCT's YCbCr conversion expects RGB)
+    import cv2
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video {path}")
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield np.ascontiguousarray(frame[..., ::-1])
+    finally:
+        capture.release()
+
+def frame_rate(path):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        return capture.get(cv2.CAP_PROP_FPS) or 25.0
+    finally:
+        capture.release()
+
+def open_writer(path, fps, shape, codec):
+    import cv2
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {', '.join(CODECS)}")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*CODECS[codec]), fps, (shape[1], shape[0]))
+    if not writer.isOpened():
+        raise ValueError(f"Cannot write {codec} video to {path} (use .mkv or .avi)")
+    return writer
+
+def embed_frame(method, options, frame, bits, offset, total):
+    # Runs in a worker: the header and as many of bits as the frame holds.
+    # Returns the stego frame and how many bits it took.
+    module = get_module(method)
+    analysis = planner.run_analysis(module, frame, options)
+    take = min(len(bits), analysis['capacity'] - HEADER_BITS)
+    if take <= 0:
+        return frame, 0
+    chunk = bits[:take]
+    data = np.concatenate([frame_header(offset, total, chunk), chunk])
+    return planner.call(module.embed_bits, frame, data, **planner.engine_options(module, options, analysis)), take
+
+def extract_frame(method, options, frame):
+    # Runs in a worker: (offset, payload length, chunk) of a frame, None when it carries none
+    module = get_module(method)
+    analysis = planner.run_analysis(module, frame, options)
+    if analysis['capacity'] < HEADER_BITS:
+        return None
+    bits = planner.call(module.extract_bits, frame, analysis['capacity'], **planner.engine_options(module, options, analysis))
+    magic, offset, length, total, crc = HEADER.unpack(np.packbits(bits[:HEADER_BITS]).tobytes())
+    chunk = bits[HEADER_BITS:HEADER_BITS + length]
+    if magic != MAGIC or len(chunk) != length or chunk_crc(offset, total, chunk) != crc:
+        return None
+    return offset, total, chunk
+
+def embed(video_path, secret_data, output_path, method='LSB', codec=DEFAULT_CODEC, workers=None, window=None,
+          frame_bits=None, progress=None, **options):
+    # frame_bits caps the payload bits per frame (default: what the first frame holds)
+    module = get_module(method)
+    bits = payload.from_secret(secret_data, method).bits
+    total = len(bits)
+    workers = workers or os.cpu_count() or 1
+    window = window or 2 * workers
+    # Ranges of the payload not given to a frame yet
+    unassigned = deque([(0, total)])
+    embedded = 0
+    frames = 0
+    writer = None
+
+    def finish(in_flight):
+        # Writes the oldest frame; the bits it could not take go back to the front
+        nonlocal embedded, frames
+        job, frame, start, end = in_flight.popleft()
+        if job is not None:
+            frame, taken = job.result()
+            if start + taken < end:
+                unassigned.appendleft((start + taken, end))
+            embedded += taken
+        writer.write(np.ascontiguousarray(frame[..., ::-1]))
+        frames += 1
+        if progress:
+            progress(frames, embedded, total)
+
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            in_flight = deque()
+            for frame in read_frames(video_path):
+                if writer is None:
+                    writer = open_writer(output_path, frame_rate(video_path), frame.shape, codec)
+                    if frame_bits is None:
+                        frame_bits = planner.run_analysis(module, frame, options)['capacity'] - HEADER_BITS
+                    if frame_bits <= 0:
+                        raise ValueError(f"Frames of {frame.shape[1]}x{frame.shape[0]} are too small for {method}")
+                if unassigned:
+                    start, end = unassigned.popleft()
+                    if end - start > frame_bits:
+                        unassigned.appendleft((start + frame_bits, end))
+                        end = start + frame_bits
+                    job = pool.submit(embed_frame, method, options, frame, bits[start:end], start, total)
+                    in_flight.append((job, None, start, end))
+                else:
+                    # Nothing left to hide (unless a frame in flight hands bits back): copied as is
+                    in_flight.append((None, frame, 0, 0))
+                while len(in_flight) > window:
+                    finish(in_flight)
+            while in_flight:
+                finish(in_flight)
+        if writer is None:
+            raise ValueError(f"No frames in {video_path}")
+        if embedded < total:
+            raise ValueError(f"Secret needs {total} bits but the video only holds {embedded}")
+    except BaseException:
+        if writer is not None:
+            writer.release()
+            writer = None
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        raise
+    finally:
+        if writer is not None:
+            writer.release()
+    return total
+
+def extract(video_path, method='LSB', workers=None, window=None, progress=None, **options):
+    get_module(method)
+    workers = workers or os.cpu_count() or 1
+    window = window or 2 * workers
+    chunks = {}
+    total = None
+    received = 0
+    frames = 0
+    with ProcessPoolExecutor(workers) as pool:
+        in_flight = deque()
+        reader = read_frames(video_path)
+        try:
+            while total is None or received < total:
+                frame = next(reader, None)
+                if frame is not None:
+                    in_flight.append(pool.submit(extract_frame, method, options, frame))
+                    if len(in_flight) <= window:
+                        continue
+                if not in_flight:
+                    break
+                result = in_flight.popleft().result()
+                frames += 1
+                if result is not None:
+                    offset, length, chunk = result
+                    if total is None:
+                        total = length
+                    if length == total and offset not in chunks:
+                        chunks[offset] = chunk
+                        received += len(chunk)
+                if progress:
+                    progress(frames, received, total)
+        finally:
+            # The payload is complete: frames still queued are not needed
+            for job in in_flight:
+                job.cancel()
+            reader.close()
+    if total is None:
+        raise ValueError("No embedded payload found (wrong method, options or key?)")
+    if received < total:
+        raise ValueError(f"Video ends before the payload: {received} of {total} bits found")
+    bits = np.concatenate([chunks[offset] for offset in sorted(chunks)])
+
+    def read_bits(n):
+        if n > total:
+            raise ValueError(f"Cannot read {n} bits from a video holding {total}")
+        return bits[:n]
+
+    return payload.read(read_bits)
@@ -0,0 +1,63 @@
+import os
+import numpy as np
+from stega import Embedder, Extractor
+
+# Covers and method configurations shared by the tests. Everything is built
+# from fixed seeds, so a failure always reproduces.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (id, method, options) of every engine configuration under test
+CONFIGS = [
+    ('lsb', 'LSB', {}),
+    ('lsb-2bits', 'LSB', {'n_bits': 2}),
+    ('lsb-4bits-key', 'LSB', {'n_bits': 4, 'key': 'corpus'}),
+    ('lsb-matrix', 'LSB', {'matrix': True}),
+    ('lsb-matrix-key', 'LSB', {'matrix': True, 'key': 'corpus'}),
+    ('pvd', 'PVD', {}),
+    ('pvd-key', 'PVD', {'key': 'corpus'}),
+    ('dct', 'DCT', {}),
+    ('dct-rgb-key', 'DCT', {'color_space': 'rgb', 'key': 'corpus'}),
+    ('dhwt', 'DHWT', {}),
+    ('dhwt-key', 'DHWT', {'key': 'corpus'}),
+]
+
+def sample(name):
+    from stega.images import load_image
+    return load_image(os.path.join(ROOT, name))
+
+def smooth(rng, shape):
+    # Natural looking content: coarse noise upsampled, plus a little fine noise
+    coarse = rng.integers(0, 256, (shape[0] // 8 + 2, shape[1] // 8 + 2) + shape[2:])
+    base = np.repeat(np.repeat(coarse, 8, axis=0), 8, axis=1)[:shape[0], :shape[1]]
+    return np.clip(base + rng.integers(-3, 4, shape), 0, 255).astype(np.uint8)
+
+def edge_images():
+    # name -> synthetic cover with a shape or content that has tripped engines up
+    rng = np.random.default_rng(2024)
+    checker = (np.indices((64, 64)).sum(axis=0) % 2 * 255).astype(np.uint8)
+    gradient = np.broadcast_to(np.linspace(0, 255, 50).astype(np.uint8), (37, 50))
+    rgba = smooth(rng, (33, 41, 4))
+    rgba[..., 3] = np.where(rng.random((33, 41)) < 0.5, 0, 255)
+    return {
+        'odd-width-31x45': smooth(rng, (31, 45)),
+        'not-multiple-of-8-93x100': smooth(rng, (93, 100)),
+        'one-row-1x64': smooth(rng, (1, 64)),
+        'tiny-8x8': smooth(rng, (8, 8)),
+        'black-64x64': np.zeros((64, 64), dtype=np.uint8),
+        'white-64x64': np.full((64, 64), 255, dtype=np.uint8),
+        'checker-0-255-64x64': checker,
+        'gradient-37x50': np.ascontiguousarray(gradient),
+        'rgb-odd-27x35': smooth(rng, (27, 35, 3)),
+        'rgb-odd-75x123': smooth(rng, (75, 123, 3)),
+        'rgba-odd-33x41': rgba,
+        'noise-48x48': rng.integers(0, 256, (48, 48), dtype=np.uint8),
+    }
+
+def secret_bytes(seed, size):
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+def round_trip(method, options, cover, secret):
+    stego = Embedder(method, **options).embed(cover, secret)
+    assert stego.shape == cover.shape and stego.dtype == np.uint8
+    return stego, Extractor(method, **options).extract(stego)
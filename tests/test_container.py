@@ -0,0 +1,25 @@
+import zlib
+import pytest
+from stega import container
+
+def frame_with_body(body, length):
+    # zlib compressed bytes frame declaring length bytes of data
+    return container.HEADER.pack(container.MAGIC, container.VERSION, 1, 0, 1, length, len(body), 0, 0) + body
+
+def test_round_trip():
+    data = b'hello world' * 50
+    frame = container.decode(container.encode(data, 'bytes', 'LSB', 'zlib'))
+    assert frame.data == data and frame.compression == 'zlib'
+
+def test_decompression_bomb():
+    # 256 MiB of zeros declared as 10 bytes: rejected without inflating it
+    body = zlib.compress(bytes(256 << 20), 9)
+    with pytest.raises(ValueError, match='larger than its declared length'):
+        container.decode(frame_with_body(body, 10))
+
+@pytest.mark.parametrize('damage', ['trailing', 'truncated'])
+def test_damaged_body(damage):
+    body = zlib.compress(b'hello world' * 50)
+    body = body + b'junk' if damage == 'trailing' else body[:-3]
+    with pytest.raises(ValueError, match='Corrupted payload body'):
+        container.decode(frame_with_body(body, 550))
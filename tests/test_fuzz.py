@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pytest
+from stega import Embedder, Extractor
+from .corpus import smooth
+
+# Randomized round trips: method, options, cover shape and content, secret
+# kind and size all drawn from a seeded generator. Every case is one seed,
+# so a failure reproduces with
+#   python -m pytest tests/test_fuzz.py -k "seed-123"
+# STEGA_FUZZ_CASES sets how many seeds run (default 200), STEGA_FUZZ_SEED the
+# first one, to explore beyond the usual cases.
+
+FUZZ_CASES = int(os.environ.get('STEGA_FUZZ_CASES', 200))
+FUZZ_SEED = int(os.environ.get('STEGA_FUZZ_SEED', 0))
+
+def draw_options(rng, method):
+    options = {}
+    if rng.random() < 0.5:
+        options['key'] = f'fuzz-{rng.integers(1 << 30)}'
+    if method == 'LSB':
+        if rng.random() < 0.3:
+            options['matrix'] = True
+        else:
+            options['n_bits'] = int(rng.integers(1, 5))
+    elif method == 'DCT':
+        options['step'] = float(rng.choice([16, 24, 32]))
+        options['color_space'] = str(rng.choice(['ycbcr', 'rgb']))
+    return options
+
+def draw_cover(rng):
+    height, width = (int(n) for n in rng.integers(1, 97, 2))
+    shape = (height, width) + (() if rng.random() < 0.4 else (int(rng.choice([1, 2, 3, 4])),))
+    content = rng.choice(['smooth', 'noise', 'flat', 'saturated'])
+    if content == 'smooth':
+        return smooth(rng, shape)
+    if content == 'noise':
+        return rng.integers(0, 256, shape, dtype=np.uint8)
+    if content == 'flat':
+        return np.full(shape, rng.integers(0, 256), dtype=np.uint8)
+    return (rng.random(shape) < 0.5).astype(np.uint8) * 255
+
+def draw_secret(rng, room):
+    # A secret of at most room bytes: bytes, text or a small image
+    kind = rng.choice(['bytes', 'text', 'image'])
+    size = int(rng.integers(0, room + 1))
+    if kind == 'text':
+        return ''.join(chr(c) for c in rng.integers(32, 0x3000, size // 3))
+    if kind == 'image':
+        side = max(int(np.sqrt(max(size - 16, 1))), 1)
+        return rng.integers(0, 256, (side, side), dtype=np.uint8)
+    return rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+
+@pytest.mark.parametrize('seed', range(FUZZ_SEED, FUZZ_SEED + FUZZ_CASES), ids=lambda seed: f'seed-{seed}')
+def test_fuzz_round_trip(seed):
+    rng = np.random.default_rng(seed)
+    method = str(rng.choice(['LSB', 'PVD', 'DCT', 'DHWT']))
+    options = draw_options(rng, method)
+    cover = draw_cover(rng)
+    embedder = Embedder(method, **options)
+    secret = draw_secret(rng, max(embedder.capacity(cover) // 8 - 40, 0))
+    if not embedder.fits(cover, secret):
+        with pytest.raises(ValueError):
+            embedder.embed(cover, secret)
+        return
+    stego = embedder.embed(cover, secret)
+    assert stego.shape == cover.shape and stego.dtype == np.uint8
+    bitstream = Extractor(method, **options).extract(stego)
+    if isinstance(secret, str):
+        assert bitstream.to_text() == secret
+    elif isinstance(secret, np.ndarray):
+        np.testing.assert_array_equal(bitstream.to_image(), secret)
+    else:
+        assert bitstream.to_bytes() == secret
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import pytest
+from stega import Embedder, container, payload
+from .corpus import CONFIGS, edge_images, sample, secret_bytes
+
+# Hashes of the stego images of fixed covers and secrets, recorded from a
+# known good tree. A rewrite of an engine (vectorized, reordered, ...) must
+# leave them unchanged; a deliberate format change regenerates them with
+#   python -m tests.test_golden
+# DCT and ROBUST go through floating point transforms: a different BLAS can
+# in principle round a pixel the other way, check the round trip tests first.
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.json')
+GOLDEN_COVERS = ('lena', 'not-multiple-of-8-93x100', 'rgb-odd-75x123', 'rgba-odd-33x41')
+EXTRA_CASES = [('robust', 'ROBUST', {}, 'lena', 150), ('robust-key', 'ROBUST', {'key': 'corpus'}, 'baboon', 150)]
+
+def covers():
+    images = edge_images()
+    images.update(lena=sample('lena.png'), baboon=sample('baboon.png'))
+    return images
+
+def cases():
+    # (case id, method, options, cover name, secret size in bytes or as a share of the capacity)
+    result = []
+    for config_id, method, options in CONFIGS:
+        for cover_name in GOLDEN_COVERS:
+            # Small enough for every configuration and cover
+            result.append((f'{config_id}/{cover_name}', method, options, cover_name, 16))
+        # Nearly full: the whole cover goes through the engine
+        result.append((f'{config_id}/lena-full', method, options, 'lena', 0.9))
+    for config_id, method, options, cover_name, size in EXTRA_CASES:
+        result.append((f'{config_id}/{cover_name}', method, options, cover_name, size))
+    return result
+
+def stego_hash(method, options, cover, size):
+    if isinstance(size, float):
+        capacity = Embedder(method, **options).capacity(cover)
+        size = int(size * (capacity // 8 - container.HEADER.size))
+    # No compression, so the hash does not depend on the zlib build
+    bitstream = payload.from_secret(secret_bytes(size, size), method, compression='none')
+    stego = Embedder(method, **options).embed(cover, bitstream)
+    return hashlib.sha256(f'{stego.shape} {stego.dtype} '.encode() + stego.tobytes()).hexdigest()
+
+def load_golden():
+    with open(GOLDEN_PATH) as f:
+        return json.load(f)
+
+COVERS = covers()
+
+@pytest.mark.parametrize('case_id, method, options, cover_name, size', cases(), ids=[c[0] for c in cases()])
+def test_golden(case_id, method, options, cover_name, size):
+    golden = load_golden()
+    assert case_id in golden, f"No golden hash for {case_id}, run python -m tests.test_golden"
+    assert stego_hash(method, options, COVERS[cover_name], size) == golden[case_id]
+
+if __name__ == '__main__':
+    hashes = {case_id: stego_hash(method, options, COVERS[cover_name], size)
+              for case_id, method, options, cover_name, size in cases()}
+    with open(GOLDEN_PATH, 'w') as f:
+        json.dump(hashes, f, indent=1, sort_keys=True)
+        f.write('\n')
+    print(f"{len(hashes)} golden hashes written to {GOLDEN_PATH}")
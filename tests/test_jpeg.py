@@ -0,0 +1,54 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from stega import jpeg
+from .corpus import edge_images, sample, secret_bytes
+
+COVERS = dict(edge_images(), lena=sample('lena.png'))
+
+# (cover, Pillow save options): every chroma subsampling, odd sizes and restart intervals
+FILES = [
+    ('lena', {'quality': 85}),
+    ('lena', {'quality': 100, 'subsampling': 0}),
+    ('rgb-odd-75x123', {'quality': 60, 'subsampling': 1}),
+    ('rgb-odd-75x123', {'quality': 90, 'restart_marker_blocks': 3}),
+    ('rgb-odd-27x35', {'quality': 95, 'restart_marker_blocks': 1}),
+    ('not-multiple-of-8-93x100', {'quality': 75}),
+    ('noise-48x48', {'quality': 100, 'restart_marker_blocks': 2}),
+    ('black-64x64', {'quality': 50}),
+]
+
+def jpeg_bytes(cover_name, options):
+    out = io.BytesIO()
+    Image.fromarray(COVERS[cover_name]).save(out, format='JPEG', **options)
+    return out.getvalue()
+
+@pytest.mark.parametrize('cover_name, options', FILES, ids=[f'{name}-{options}' for name, options in FILES])
+def test_unchanged_coefficients_written_back_byte_for_byte(cover_name, options):
+    data = jpeg_bytes(cover_name, options)
+    assert jpeg.read_jpeg(data).to_bytes() == data
+
+@pytest.mark.parametrize('cover_name, options', FILES, ids=[f'{name}-{options}' for name, options in FILES])
+def test_coefficients_survive_re_encoding(cover_name, options):
+    # Changed coefficients (every magnitude LSB flipped, as embedding does) are read back as written
+    image = jpeg.read_jpeg(jpeg_bytes(cover_name, options))
+    for plane in image.coefficients:
+        plane[..., 1:] = np.where(np.abs(plane[..., 1:]) >= 2, np.sign(plane[..., 1:]) * (np.abs(plane[..., 1:]) ^ 1), plane[..., 1:])
+    decoded = jpeg.read_jpeg(image.to_bytes())
+    for written, read in zip(image.coefficients, decoded.coefficients):
+        np.testing.assert_array_equal(written, read)
+    with Image.open(io.BytesIO(image.to_bytes())) as reopened:
+        reopened.load()
+
+def test_embed_with_restart_intervals():
+    cover = jpeg.read_jpeg(jpeg_bytes('lena', {'quality': 80, 'restart_marker_blocks': 5}))
+    secret = secret_bytes(3, 800)
+    stego = jpeg.embed(cover, secret, key='corpus')
+    assert jpeg.extract(jpeg.read_jpeg(stego.to_bytes()), key='corpus').to_bytes() == secret
+
+def test_corrupt_scan():
+    data = jpeg_bytes('lena', {'quality': 85})
+    # Cut the scan short, then end the file
+    with pytest.raises(ValueError):
+        jpeg.read_jpeg(data[:len(data) // 2] + b'\xff\xd9')
@@ -0,0 +1,32 @@
+import io
+import zlib
+import numpy as np
+import pytest
+from stega import png
+
+def idat_data(data):
+    return b''.join(body for kind, body in png.read_chunks(data) if kind == b'IDAT')
+
+@pytest.mark.parametrize('channels', [1, 2, 3, 4])
+@pytest.mark.parametrize('filter', png.FILTERS)
+def test_multi_strip_round_trip(channels, filter):
+    from PIL import Image
+    # Several strips of 16 KiB, the last one partial
+    shape = (301, 257) if channels == 1 else (301, 257, channels)
+    pixels = np.random.default_rng(channels).integers(0, 256, shape, dtype=np.uint8)
+    data = png.encode_png(pixels, filter=filter, cache=None, strip_bytes=16 * 1024)
+    # zlib checks the combined Adler-32 of the strips
+    raw = zlib.decompress(idat_data(data))
+    assert len(raw) == 301 * (257 * channels + 1)
+    with Image.open(io.BytesIO(data)) as image:
+        np.testing.assert_array_equal(np.array(image), pixels)
+
+def test_cached_strips():
+    # Strips taken from the cache give the same file
+    cache = png.SegmentCache()
+    pixels = np.random.default_rng(0).integers(0, 256, (200, 300, 3), dtype=np.uint8)
+    first = png.encode_png(pixels, cache=cache, strip_bytes=8 * 1024)
+    assert cache.hits == 0
+    assert png.encode_png(pixels, cache=cache, strip_bytes=8 * 1024) == first
+    assert cache.hits > 0
+    zlib.decompress(idat_data(first))
@@ -0,0 +1,145 @@
+import inspect
+import io
+import numpy as np
+import pytest
+from stega import Embedder, Extractor, container, get_module, reedsolomon
+from .corpus import CONFIGS, edge_images, round_trip, sample, secret_bytes
+
+COVERS = dict(edge_images(), lena=sample('lena.png'), baboon=sample('baboon.png'))
+
+# Frame header of a bytes secret, what a cover must hold beyond the secret
+HEADER_BITS = container.HEADER.size * 8
+
+@pytest.mark.parametrize('config_id, method, options', CONFIGS, ids=[c[0] for c in CONFIGS])
+@pytest.mark.parametrize('cover_name', list(COVERS))
+def test_round_trip(config_id, method, options, cover_name):
+    cover = COVERS[cover_name]
+    capacity = Embedder(method, **options).capacity(cover)
+    if capacity < HEADER_BITS + 8:
+        with pytest.raises(ValueError):
+            Embedder(method, **options).embed(cover, b'x')
+        return
+    # Half the room, then all of it
+    for size in ((capacity - HEADER_BITS) // 16, (capacity - HEADER_BITS) // 8):
+        secret = secret_bytes(size, max(size, 1))
+        _, bitstream = round_trip(method, options, cover, secret)
+        assert bitstream.kind == 'bytes'
+        assert bitstream.to_bytes() == secret
+
+@pytest.mark.parametrize('config_id, method, options', CONFIGS, ids=[c[0] for c in CONFIGS])
+def test_over_capacity(config_id, method, options):
+    cover = COVERS['odd-width-31x45']
+    capacity = Embedder(method, **options).capacity(cover)
+    with pytest.raises(ValueError):
+        Embedder(method, **options).embed(cover, secret_bytes(0, capacity // 8 + 1))
+
+@pytest.mark.parametrize('config_id, method, options', CONFIGS, ids=[c[0] for c in CONFIGS])
+def test_text_and_image_secrets(config_id, method, options):
+    cover = COVERS['baboon']
+    _, bitstream = round_trip(method, options, cover, 'Grüße, 秘密 ✓')
+    assert bitstream.kind == 'text' and bitstream.to_text() == 'Grüße, 秘密 ✓'
+    secret_image = COVERS['rgb-odd-27x35'][:10, :12]
+    _, bitstream = round_trip(method, options, cover, secret_image)
+    assert bitstream.kind == 'image'
+    np.testing.assert_array_equal(bitstream.to_image(), secret_image)
+
+@pytest.mark.parametrize('n_bits', [1, 2, 3, 4])
+def test_lsb_only_changes_low_bits(n_bits):
+    # The old bit arithmetic could carry into the upper bits
+    cover = COVERS['lena']
+    lsb = get_module('LSB')
+    bits = np.random.default_rng(n_bits).integers(0, 2, lsb.capacity(cover, n_bits), dtype=np.uint8)
+    stego = lsb.embed_bits(cover, bits, n_bits)
+    assert not ((stego ^ cover) >> n_bits).any()
+    np.testing.assert_array_equal(lsb.extract_bits(stego, len(bits), n_bits), bits)
+
+@pytest.mark.parametrize('method', ['LSB', 'PVD', 'DCT', 'DHWT', 'ROBUST'])
+def test_every_embed_option_accepted(method):
+    # Options only embed_bits uses (DCT max_iterations) still go through the planner and the extractor
+    parameters = list(inspect.signature(get_module(method).embed_bits).parameters.values())[2:]
+    options = {p.name: p.default for p in parameters if p.name not in ('analysis', 'key')}
+    _, bitstream = round_trip(method, options, COVERS['lena'], b'options')
+    assert bitstream.to_bytes() == b'options'
+
+def test_dhwt_image_secret():
+    # dhwt.embed used to fail on image secrets
+    secret_image = COVERS['lena'][:64, :64]
+    _, bitstream = round_trip('DHWT', {}, COVERS['baboon'], secret_image)
+    np.testing.assert_array_equal(bitstream.to_image(), secret_image)
+
+@pytest.mark.parametrize('config_id, method, options', CONFIGS, ids=[c[0] for c in CONFIGS])
+def test_wrong_key(config_id, method, options):
+    stego, _ = round_trip(method, options, COVERS['lena'], b'keyed secret')
+    wrong = dict(options, key='not the key')
+    with pytest.raises(ValueError):
+        Extractor(method, **wrong).extract(stego)
+
+def test_jpeg_round_trip(tmp_path):
+    from PIL import Image
+    jpeg = get_module('JPEG')
+    path = tmp_path / 'lena.jpg'
+    Image.fromarray(COVERS['lena']).save(path, quality=85)
+    cover = jpeg.read_jpeg(str(path))
+    secret = secret_bytes(1, 1500)
+    stego = jpeg.embed(cover, secret, key='corpus')
+    # Through the file bytes, as a receiver gets it
+    assert jpeg.extract(jpeg.read_jpeg(stego.to_bytes()), key='corpus').to_bytes() == secret
+    with Image.open(io.BytesIO(stego.to_bytes())) as decoded:
+        assert decoded.size == (512, 512)
+
+@pytest.mark.parametrize('cover_name', ['lena', 'baboon'])
+def test_robust_round_trip(cover_name):
+    _, bitstream = round_trip('ROBUST', {'key': 'corpus'}, COVERS[cover_name], secret_bytes(2, 150))
+    assert bitstream.to_bytes() == secret_bytes(2, 150)
+
+def test_robust_small_cover():
+    with pytest.raises(ValueError, match='working plane'):
+        Embedder('ROBUST').embed(COVERS['not-multiple-of-8-93x100'], b'x')
+    # A smaller working plane fits a smaller cover
+    _, bitstream = round_trip('ROBUST', {'size': 256}, COVERS['lena'][:300, :260], b'small')
+    assert bitstream.to_bytes() == b'small'
+
+def test_dct_positions_outside_block():
+    # The default mid band reaches coordinate 4: it does not fit a 4x4 block
+    with pytest.raises(ValueError, match='outside the 4x4 block'):
+        Embedder('DCT', block_size=4).embed(COVERS['lena'], b'x')
+    with pytest.raises(ValueError, match='outside the 4x4 block'):
+        Extractor('DCT', block_size=4).extract(COVERS['lena'])
+    _, bitstream = round_trip('DCT', {'block_size': 4, 'positions': ((1, 2), (2, 1))}, COVERS['lena'], b'small blocks')
+    assert bitstream.to_bytes() == b'small blocks'
+
+def test_dct_argument_order():
+    # embed_bits and extract_bits take their options in the same order
+    dct = get_module('DCT')
+    embed_names = list(inspect.signature(dct.embed_bits).parameters)[2:]
+    extract_names = list(inspect.signature(dct.extract_bits).parameters)[2:]
+    assert extract_names == embed_names[:len(extract_names)]
+
+@pytest.mark.parametrize('method', ['LSB', 'PVD', 'DCT', 'DHWT', 'ROBUST'])
+def test_unknown_option(method):
+    # A misspelt option is an error, not silently dropped by the planner
+    with pytest.raises(ValueError, match='Unknown option'):
+        Embedder(method, kee='corpus')
+    with pytest.raises(ValueError, match='Unknown option'):
+        Extractor(method, kee='corpus')
+
+@pytest.mark.parametrize('method, option', [('LSB', 'n_bits'), ('DCT', 'step'), ('ROBUST', 'repeat')])
+def test_option_given_as_text(method, option):
+    # Query strings and command lines give text; a number option must parse as one
+    with pytest.raises(ValueError, match='must be a number'):
+        Embedder(method, **{option: 'abc'})
+
+def test_reed_solomon_prefers_reliable_candidate():
+    # Three errors with four parity bytes: errors-only correction lands on
+    # another codeword (seed 63), the three unreliable bytes as erasures on
+    # the right one
+    rng = np.random.default_rng(63)
+    messages = rng.integers(0, 256, (1, 12))
+    received = reedsolomon.encode(messages, 4)
+    received[0, [2, 7, 11]] ^= rng.integers(1, 256, 3).astype(np.uint8)
+    assert reedsolomon.correct(received[0], reedsolomon.syndromes(received, 4)[0], 4) is not None
+    reliability = np.full((1, 16), 10.0)
+    reliability[0, [2, 7, 11]] = 1.0
+    decoded, failed = reedsolomon.decode(received, 4, reliability)
+    assert failed == 0
+    np.testing.assert_array_equal(decoded, messages)
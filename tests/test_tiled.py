@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from stega import Embedder, matrix as hamming, tiled
+from stega.lsb import samples
+from .corpus import CONFIGS, sample, secret_bytes
+
+COVERS = {'lena': sample('lena.png'), 'baboon': sample('baboon.png')[..., :3]}
+# Strips of a few dozen rows: many strips per cover
+TILE_BYTES = 40000
+
+@pytest.mark.parametrize('config_id, method, options', CONFIGS, ids=[c[0] for c in CONFIGS])
+@pytest.mark.parametrize('cover_name', list(COVERS))
+def test_tiled_round_trip(config_id, method, options, cover_name):
+    cover = COVERS[cover_name]
+    # Most of what the whole image holds, so the payload crosses every strip
+    secret = secret_bytes(3, Embedder(method, **options).capacity(cover) // 8 * 3 // 4)
+    stego = np.empty_like(cover)
+    tiled.embed(cover, secret, stego, method, TILE_BYTES, **options)
+    assert tiled.extract(stego, method, TILE_BYTES, **options).to_bytes() == secret
+
+@pytest.mark.parametrize('key', [None, 'corpus'])
+@pytest.mark.parametrize('size', [100, 3000, 20000])
+def test_tiled_matrix_uses_one_code(key, size):
+    # One k for the whole payload, as embedding the whole image chooses it
+    cover = COVERS['baboon']
+    secret = secret_bytes(size, size)
+    stego = np.empty_like(cover)
+    tiled.embed(cover, secret, stego, 'LSB', TILE_BYTES, matrix=True, key=key)
+    whole = Embedder('LSB', matrix=True, key=key).embed(cover, secret)
+    flat = stego.reshape(-1)
+    first_strip = flat[:tiled.strip_rows(cover, TILE_BYTES, 1) * cover.shape[1] * cover.shape[2]]
+    assert hamming.read_k(samples(first_strip, key, hamming.K_BITS) & 1) == \
+        hamming.read_k(samples(whole.reshape(-1), key, hamming.K_BITS) & 1)
+    # About as few changes as the whole image embedding
+    assert np.count_nonzero(stego != cover) <= 1.02 * np.count_nonzero(whole != cover) + 16
+    assert tiled.extract(stego, 'LSB', TILE_BYTES, matrix=True, key=key).to_bytes() == secret
+
+def test_compressed_cover_refused(tmp_path):
+    # A PNG given with a shape would otherwise be embedded as raw pixels
+    with pytest.raises(ValueError, match='convert it to .npy'):
+        tiled.open_image(str(tmp_path / 'cover.png'), (64, 64))